@@ -8,7 +8,24 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('backend/voice_backend.py', '.'), ('backend/config.py', '.')],
+    datas=[
+        ('backend/voice_backend.py', '.'),
+        ('backend/config.py', '.'),
+        ('backend/worker.py', '.'),
+        ('backend/audio.py', '.'),
+        ('backend/chunking.py', '.'),
+        ('backend/streaming.py', '.'),
+        ('backend/protocol.py', '.'),
+        ('backend/models.py', '.'),
+        ('backend/resources.py', '.'),
+        ('backend/cache.py', '.'),
+        ('backend/telemetry.py', '.'),
+        ('backend/language.py', '.'),
+        ('backend/probe.py', '.'),
+        ('backend/preprocess.py', '.'),
+        ('backend/windowed.py', '.'),
+        ('backend/batching.py', '.'),
+    ],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,108 @@
+"""
+Decoding of media files (audio or video) straight into memory.
+ffmpeg outputs 16 kHz mono float32 PCM, which is what Whisper works with, so there is
+no temporary file and no lossy mp3 encode/decode round trip.
+WAV files that are already 16 bit PCM at 16 kHz are read directly (read_wav).
+"""
+import subprocess
+import tempfile
+import wave
+from typing import IO, Optional
+
+import numpy as np
+
+# # this import is relative, because audio.py is used by the backend subprocess
+import config as CONFIG
+
+READ_SIZE = 1 << 20
+
+
+def decode_audio(
+    file_path: str,
+    sample_rate: int = CONFIG.SAMPLE_RATE,
+    start: float = 0,
+    duration: Optional[float] = None,
+    stream: Optional[int] = None,
+) -> np.ndarray:
+    # start and duration (seconds) decode only part of the file, stream is the index of
+    # the audio stream to decode (see probe.py), ffmpeg picks one by default
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0"]
+    if start:
+        # before -i, so ffmpeg seeks in the container instead of decoding up to there
+        cmd += ["-ss", str(start)]
+    if duration is not None:
+        cmd += ["-t", str(duration)]
+    cmd += ["-i", file_path]
+    if stream is not None:
+        cmd += ["-map", f"0:{stream}"]
+    cmd += [
+        # don't decode the video stream, we only want the audio
+        "-vn",
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "-",
+    ]
+    with tempfile.TemporaryFile() as errors_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors_file)
+
+        # A bytearray keeps the buffer writable, so numpy (and torch) can use it without a copy
+        buffer = bytearray()
+        while chunk := process.stdout.read(READ_SIZE):
+            buffer += chunk
+        check_ffmpeg(process, errors_file)
+
+    # a truncated stream could leave a partial sample at the end
+    usable = len(buffer) - len(buffer) % 4
+    return np.frombuffer(buffer, dtype=np.float32, count=usable // 4)
+
+
+def check_ffmpeg(process: subprocess.Popen, errors_file: IO[bytes]) -> None:
+    # Waits for ffmpeg to exit and raises with what it printed if it failed. errors_file
+    # is its stderr, a temporary file: a pipe only read at the end could fill up first
+    if process.wait() != 0:
+        errors_file.seek(0)
+        errors = errors_file.read().decode("utf-8", errors="replace")
+        raise RuntimeError(f"Failed to decode audio: {errors.strip()}")
+
+
+def read_wav(file_path: str) -> np.ndarray:
+    # 16 bit PCM WAV already at SAMPLE_RATE (see probe.is_plain_wav), no ffmpeg needed.
+    # Raises wave.Error for the WAV variants the wave module can't read
+    with wave.open(file_path, "rb") as wav_file:
+        channels = wav_file.getnchannels()
+        frames = wav_file.readframes(wav_file.getnframes())
+    return to_mono_float(np.frombuffer(frames, dtype="<i2"), channels)
+
+
+def audio_duration(audio: np.ndarray, sample_rate: int = CONFIG.SAMPLE_RATE) -> float:
+    return audio.shape[0] / sample_rate
+
+
+def frame_energy(audio: np.ndarray, frame_length: int = CONFIG.VAD_FRAME_SAMPLES) -> np.ndarray:
+    # RMS energy of each (non overlapping) frame, the last partial frame is dropped
+    frame_count = audio.shape[0] // frame_length
+    frames = audio[: frame_count * frame_length].reshape(frame_count, frame_length)
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame_length)
+
+
+def to_mono_float(samples: np.ndarray, channels: int) -> np.ndarray:
+    # int16 interleaved PCM to mono float32 in [-1, 1]
+    audio = samples.astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio
+
+
+def resample(
+    audio: np.ndarray, orig_rate: int, target_rate: int = CONFIG.SAMPLE_RATE
+) -> np.ndarray:
+    # Linear interpolation, enough for speech (ffmpeg does the proper resampling for files)
+    if orig_rate == target_rate or not audio.shape[0]:
+        return audio
+    target_length = int(round(audio.shape[0] * target_rate / orig_rate))
+    positions = np.arange(target_length) * (orig_rate / target_rate)
+    return np.interp(positions, np.arange(audio.shape[0]), audio).astype(np.float32)
@@ -0,0 +1,132 @@
+"""
+Batched transcription of short clips (up to one whisper window, BATCH_MAX_SECONDS).
+For voice notes the fixed cost of a model.transcribe call per file is bigger than the
+inference itself, so clips are stacked instead: one mel spectrogram tensor for the batch,
+one encoder pass and one decoding loop (whisper.decode), and the results are split back
+per clip. Segments come from the timestamp tokens, there are no word timestamps.
+
+The batch size is what fits in BATCH_MEMORY_FRACTION of the available memory (RAM, or
+the GPU's). Results whisper would decode again at a higher temperature are returned as
+None, the caller transcribes them one by one.
+"""
+from typing import Optional
+
+import numpy as np
+import torch
+import whisper
+
+# # this import is relative, because batching.py is used by the backend subprocess
+import config as CONFIG
+from resources import available_mb, rss_mb
+
+# seconds per timestamp token
+TIME_PRECISION = whisper.audio.HOP_LENGTH * 2 / CONFIG.SAMPLE_RATE
+
+
+def batch_log_mel(audios: list[np.ndarray], n_mels: int) -> torch.Tensor:
+    # whisper.log_mel_spectrogram for a batch of 30 second windows, (batch, n_mels, 3000).
+    # Same steps, but the dynamic range is clamped per clip (whisper's max is per call)
+    audio = torch.from_numpy(np.stack([whisper.pad_or_trim(audio) for audio in audios]))
+    window = torch.hann_window(whisper.audio.N_FFT)
+    stft = torch.stft(
+        audio, whisper.audio.N_FFT, whisper.audio.HOP_LENGTH, window=window, return_complex=True
+    )
+    magnitudes = stft[..., :-1].abs() ** 2
+    mel = whisper.audio.mel_filters(audio.device, n_mels) @ magnitudes
+
+    log_spec = torch.clamp(mel, min=1e-10).log10()
+    log_spec = torch.maximum(log_spec, log_spec.amax(dim=(-2, -1), keepdim=True) - 8.0)
+    return (log_spec + 4.0) / 4.0
+
+
+def clip_bytes(model: whisper.Whisper) -> int:
+    # Memory of one clip while it's decoded: its mel, the encoder activations (with the
+    # attention weights of one layer) and the decoder's cached keys and values
+    dims = model.dims
+    mel = dims.n_mels * 2 * dims.n_audio_ctx
+    encoder = 8 * dims.n_audio_ctx * dims.n_audio_state + dims.n_audio_head * dims.n_audio_ctx**2
+    decoder = 2 * dims.n_text_layer * (dims.n_audio_ctx + dims.n_text_ctx) * dims.n_text_state
+    return (mel + encoder + decoder) * next(model.parameters()).element_size()
+
+
+def batch_size(model: whisper.Whisper, memory_limit_mb: Optional[float] = None) -> int:
+    if model.device.type == "cuda":
+        free_mb = torch.cuda.mem_get_info(model.device)[0] / (1024 * 1024)
+    else:
+        free_mb = available_mb()
+        if memory_limit_mb:
+            free_mb = min(free_mb or memory_limit_mb, memory_limit_mb - rss_mb())
+    if free_mb is None:
+        return CONFIG.BATCH_DEFAULT_SIZE
+
+    size = int(free_mb * 1024 * 1024 * CONFIG.BATCH_MEMORY_FRACTION / clip_bytes(model))
+    return max(1, min(CONFIG.BATCH_MAX_SIZE, size))
+
+
+def split_segments(tokens: list[int], tokenizer, duration: float) -> list[dict]:
+    # Segments between timestamp tokens: <|0.00|> text <|2.40|><|2.40|> text <|5.00|>
+    segments: list[dict] = []
+    start = 0.0
+    text_tokens: list[int] = []
+    for token in tokens:
+        if token < tokenizer.timestamp_begin:
+            text_tokens.append(token)
+            continue
+        seconds = min((token - tokenizer.timestamp_begin) * TIME_PRECISION, duration)
+        if text_tokens:
+            text = tokenizer.decode(text_tokens)
+            segments.append({"start": start, "end": seconds, "text": text, "words": []})
+            text_tokens = []
+        start = seconds
+
+    # cut at the end of the window, without its closing timestamp
+    if text_tokens:
+        text = tokenizer.decode(text_tokens)
+        segments.append({"start": start, "end": duration, "text": text, "words": []})
+    return [segment for segment in segments if segment["text"].strip()]
+
+
+def transcribe_clips(
+    model: whisper.Whisper, audios: list[np.ndarray], decode_options: dict
+) -> list[Optional[dict]]:
+    # {"segments", "language"} for every clip, None when it has to be transcribed alone.
+    # decode_options: language (None = detected per clip), task and fp16
+    mel = batch_log_mel(audios, model.dims.n_mels).to(model.device)
+    if decode_options["fp16"]:
+        mel = mel.half()
+    options = whisper.DecodingOptions(
+        task=decode_options["task"],
+        language=decode_options["language"],
+        temperature=0.0,
+        fp16=decode_options["fp16"],
+    )
+    with torch.no_grad():
+        results = whisper.decode(model, mel, options)
+
+    transcripts: list[Optional[dict]] = []
+    for audio, result in zip(audios, results):
+        tokenizer = whisper.tokenizer.get_tokenizer(
+            model.is_multilingual,
+            num_languages=model.num_languages,
+            language=result.language,
+            task=decode_options["task"],
+        )
+        # the same checks whisper's transcribe does after decoding a window
+        silent = (
+            result.no_speech_prob > CONFIG.NO_SPEECH_THRESHOLD
+            and result.avg_logprob < CONFIG.LOGPROB_THRESHOLD
+        )
+        if silent:
+            transcripts.append({"segments": [], "language": result.language})
+            continue
+        if (
+            result.compression_ratio > CONFIG.COMPRESSION_RATIO_THRESHOLD
+            or result.avg_logprob < CONFIG.LOGPROB_THRESHOLD
+        ):
+            transcripts.append(None)
+            continue
+
+        duration = audio.shape[0] / CONFIG.SAMPLE_RATE
+        segments = split_segments(result.tokens, tokenizer, duration)
+        transcripts.append({"segments": segments, "language": result.language})
+    return transcripts
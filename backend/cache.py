@@ -0,0 +1,131 @@
+"""
+Transcript cache, so the same media is not transcribed twice.
+
+Entries are JSON files in CACHE_DIR, named after a hash of a file fingerprint and the
+options that change the result (model, precision, language, task, pre-processing). The fingerprint
+reads the size and a few blocks of the file (start, end and evenly spaced samples)
+instead of the whole file, so it's cheap for big videos.
+Language identification results (see language.py) are entries of the same cache.
+The cache is an LRU bounded to CACHE_MAX_BYTES: hits touch the entry's mtime and the
+oldest entries are removed when a new one doesn't fit.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import Optional
+
+# # this import is relative, because cache.py is used by the backend subprocess
+import config as CONFIG
+
+
+def file_fingerprint(file_path: str) -> str:
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=20)
+    block = CONFIG.FINGERPRINT_BLOCK_BYTES
+
+    with open(file_path, "rb") as media:
+        if size <= block * (CONFIG.FINGERPRINT_BLOCKS + 2):
+            digest.update(media.read())
+            return digest.hexdigest()
+
+        offsets = [0, size - block]
+        step = size // (CONFIG.FINGERPRINT_BLOCKS + 1)
+        offsets += [step * index for index in range(1, CONFIG.FINGERPRINT_BLOCKS + 1)]
+        for offset in sorted(offsets):
+            media.seek(offset)
+            digest.update(media.read(block))
+
+    return digest.hexdigest()
+
+
+def cache_key(
+    file_path: str,
+    options: dict,
+    language: Optional[str],
+    task: str,
+    preprocess: bool,
+    batched: bool = False,
+) -> str:
+    result_options = {
+        "model": options["name"],
+        "precision": options["precision"],
+        "language": language,
+        "task": task,
+        "preprocess": preprocess,
+    }
+    # batched transcripts have no word timestamps (see batching.py)
+    if batched:
+        result_options["batched"] = True
+    digest = hashlib.blake2b(file_fingerprint(file_path).encode(), digest_size=20)
+    digest.update(json.dumps(result_options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def language_key(file_path: str, options: dict, windows: int) -> str:
+    digest = hashlib.blake2b(file_fingerprint(file_path).encode(), digest_size=20)
+    digest.update(json.dumps({"language_id": options["name"], "windows": windows}).encode())
+    return digest.hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CONFIG.CACHE_DIR, f"{key}.json")
+
+
+def load(key: str) -> Optional[dict]:
+    # {"duration", "language", "segments"} (or what was given to store_entry) or None
+    path = _entry_path(key)
+    try:
+        with open(path) as entry_file:
+            entry = json.load(entry_file)
+    except (OSError, ValueError):
+        return None
+
+    # most recently used. Another worker may have evicted it meanwhile
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return entry
+
+
+def store(key: str, duration: float, language: Optional[str], segments: list[dict]) -> None:
+    store_entry(key, {"duration": duration, "language": language, "segments": segments})
+
+
+def store_entry(key: str, entry: dict) -> None:
+    # Called once the job is done: a cache problem is reported, it doesn't fail the job
+    try:
+        os.makedirs(CONFIG.CACHE_DIR, exist_ok=True)
+        # a temporary file per process, workers can store the same entry at the same time
+        handle, temp_path = tempfile.mkstemp(dir=CONFIG.CACHE_DIR, suffix=".tmp")
+        with os.fdopen(handle, "w") as entry_file:
+            json.dump(entry, entry_file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, _entry_path(key))
+        evict()
+    except (OSError, ValueError) as error:
+        print(f"Cache entry not stored: {error}", file=sys.stderr)
+
+
+def evict(max_bytes: int = CONFIG.CACHE_MAX_BYTES) -> None:
+    # workers sharing CACHE_DIR evict at the same time, entries can go away at any point
+    entries = []
+    for entry in os.scandir(CONFIG.CACHE_DIR):
+        if entry.name.endswith(".json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    # least recently used first
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,168 @@
+"""
+Chunked transcription of long files.
+The audio is split at quiet points (lowest energy frame near every chunk boundary),
+the chunks are transcribed in a pool of processes (each one with its own model), and
+the segments are stitched back in order with their timestamps moved by the chunk offset.
+"""
+import os
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+
+import numpy as np
+import whisper
+
+# # this import is relative, because chunking.py is used by the backend subprocess
+import config as CONFIG
+import protocol
+from audio import frame_energy
+from language import detect_language
+from preprocess import TimeMap
+from models import load_model, weights_mb
+from resources import available_mb
+
+# model of the current pool process
+POOL_MODEL: Optional[whisper.Whisper] = None
+
+# (pool, model options, workers), reused between jobs so models stay loaded
+POOL: tuple | None = None
+
+
+def find_split_points(
+    audio: np.ndarray,
+    chunk_seconds: float = CONFIG.CHUNK_SECONDS,
+    search_seconds: float = CONFIG.CHUNK_SEARCH_SECONDS,
+    sample_rate: int = CONFIG.SAMPLE_RATE,
+) -> list[int]:
+    # Returns the sample indexes where chunks start, plus the end of the audio
+    frame_length = CONFIG.VAD_FRAME_SAMPLES
+    energy = frame_energy(audio, frame_length)
+    chunk_frames = int(chunk_seconds * sample_rate / frame_length)
+    search_frames = int(search_seconds * sample_rate / frame_length)
+
+    points = [0]
+    target = chunk_frames
+    while target < len(energy) - search_frames:
+        window = energy[target - search_frames : target + search_frames]
+        quietest = target - search_frames + int(np.argmin(window))
+        points.append(quietest * frame_length + frame_length // 2)
+        target = quietest + chunk_frames
+
+    points.append(audio.shape[0])
+    return points
+
+
+def _init_pool(options: dict) -> None:
+    global POOL_MODEL
+    # stdout is the worker's message channel, pool processes must not write to it
+    sys.stdout = sys.stderr
+    POOL_MODEL, _ = load_model(options)
+
+
+def _transcribe_chunk(chunk: np.ndarray, offset: float, decode_options: dict) -> list[dict]:
+    result = POOL_MODEL.transcribe(chunk, verbose=None, word_timestamps=True, **decode_options)
+    return [shift_segment(segment, offset) for segment in result["segments"]]
+
+
+def shift_segment(segment: dict, offset: float) -> dict:
+    # Keeps only what we use of whisper's segments, with times relative to the whole file
+    return {
+        "start": segment["start"] + offset,
+        "end": segment["end"] + offset,
+        "text": segment["text"],
+        "words": [
+            {**word, "start": word["start"] + offset, "end": word["end"] + offset}
+            for word in segment.get("words", [])
+        ],
+    }
+
+
+def default_workers(model: whisper.Whisper) -> int:
+    # For CHUNK_WORKERS = 0: every process loads its own model, so they are bounded by the
+    # free memory too. Models on a GPU are not split
+    if model.device.type != "cpu":
+        return 1
+    workers = (os.cpu_count() or 1) // CONFIG.CHUNK_THREADS_PER_WORKER
+    free_mb = available_mb()
+    if free_mb is not None:
+        worker_mb = weights_mb(model) + CONFIG.CHUNK_WORKER_OVERHEAD_MB
+        workers = min(workers, int(free_mb // worker_mb))
+    return max(1, min(workers, CONFIG.CHUNK_MAX_WORKERS))
+
+
+def get_pool(options: dict, workers: int) -> ProcessPoolExecutor:
+    global POOL
+    if POOL is not None and POOL[1:] == (options, workers):
+        return POOL[0]
+
+    if POOL is not None:
+        POOL[0].shutdown()
+
+    # the cores are shared between the pool processes, unless threads are set
+    threads = options["threads"] or max(1, (os.cpu_count() or 1) // workers)
+    # spawn: forking a process that already runs torch threads can deadlock
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_pool,
+        initargs=({**options, "threads": threads},),
+    )
+    POOL = (pool, options, workers)
+    return pool
+
+
+def transcribe_chunks(
+    audio: np.ndarray,
+    model: whisper.Whisper,
+    options: dict,
+    decode_options: dict,
+    workers: int,
+    on_segments: Callable,
+    time_map: Optional[TimeMap] = None,
+) -> tuple[list[dict], str]:
+    # on_segments(segments) is called for every chunk, in order. Progress messages
+    # cover every chunk as it finishes. time_map moves the times to the original
+    # media when the audio was pre-processed (see preprocess.py)
+    # Returns the segments and the language
+    time_map = time_map or TimeMap.identity()
+    # All the chunks use the language detected from the start of the file
+    if decode_options.get("language") is None:
+        decode_options = {**decode_options, "language": detect_language(model, audio)}
+
+    points = find_split_points(audio)
+    bounds = list(zip(points, points[1:]))
+    pool = get_pool(options, workers)
+    futures = {
+        pool.submit(
+            _transcribe_chunk,
+            audio[start:end],
+            start / CONFIG.SAMPLE_RATE,
+            decode_options,
+        ): index
+        for index, (start, end) in enumerate(bounds)
+    }
+
+    # progress is sent as chunks finish, segments are sent in order
+    finished: dict[int, list[dict]] = {}
+    next_index = 0
+    segments: list[dict] = []
+    for future in as_completed(futures):
+        index = futures[future]
+        finished[index] = [time_map.remap_segment(segment) for segment in future.result()]
+        start, end = bounds[index]
+        protocol.send(
+            protocol.PROGRESS,
+            start=time_map.to_original(start / CONFIG.SAMPLE_RATE),
+            seconds=time_map.to_original(end / CONFIG.SAMPLE_RATE, end=True),
+        )
+
+        while next_index in finished:
+            chunk_segments = finished.pop(next_index)
+            segments.extend(chunk_segments)
+            on_segments(chunk_segments)
+            chunk_end = bounds[next_index][1] / CONFIG.SAMPLE_RATE
+            protocol.send(protocol.CHECKPOINT, seconds=time_map.to_original(chunk_end, end=True))
+            next_index += 1
+
+    return segments, decode_options["language"]
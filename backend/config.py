@@ -1,7 +1,170 @@
 # utils.py
 ACCEPTED_FILE_TYPES = ["audio", "video"]
 
+# audio.py
+# Whisper expects 16 kHz mono audio
+SAMPLE_RATE = 16000
+# 30 ms frames for the energy based silence detection
+VAD_FRAME_SAMPLES = 480
+
 # voice_backend.py
-AUDIO_PATH = "TMP-AUDIO-FILE.mp3"
-DURATION_MSG = "Duration:"
-OUTPUT_FILE = "output.txt"
+EXTRACTING_MSG = "Extracting audio..."
+NO_AUDIO_MSG = "The file has no audio stream"
+NO_FFPROBE_MSG = "ffprobe not found, install ffmpeg (it comes with ffprobe)"
+# language detection looks at the first 30 seconds (one whisper window)
+LANGUAGE_WINDOW_SECONDS = 30
+# transcripts are written in a temporary folder (one per VoiceProcessor), one file per job
+OUTPUT_DIR_PREFIX = "openverbum-output-"
+OUTPUT_FILE = "{job_id}-{name}.txt"
+
+# preprocess.py
+# silence trimming and loudness normalization before transcribing
+PREPROCESS_ENABLED = True
+# silent stretches longer than this are cut out, keeping SILENCE_PAD_SECONDS at each side
+SILENCE_MIN_SECONDS = 2.0
+SILENCE_PAD_SECONDS = 0.3
+# silent: this many dB below the loud frames (95th percentile), and never above the floor
+SILENCE_THRESHOLD_DB = -40
+SILENCE_FLOOR_RMS = 1e-4
+# RMS target in dBFS
+LOUDNESS_TARGET_DB = -20
+LOUDNESS_MAX_GAIN_DB = 20
+PEAK_LIMIT = 0.99
+
+# language.py
+# Language identification: windows of LANGUAGE_WINDOW_SECONDS spread over the file
+LANGUAGE_WINDOWS = 3
+# windows quieter than this (RMS) don't vote
+LANGUAGE_MIN_RMS = 0.005
+# most likely languages reported with their probability
+LANGUAGE_TOP = 5
+
+# export.py
+# written next to the transcript when a job ends (txt, srt, vtt, tsv, json, ovb)
+EXPORT_FORMATS = ["txt", "srt", "vtt", "tsv", "json", "ovb"]
+
+# models.py
+# Whisper models: parameters, memory needed and speed relative to "large" (whisper's README)
+MODELS = {
+    "tiny": {"parameters": "39 M", "memory": "~1 GB", "speed": "~10x"},
+    "tiny.en": {"parameters": "39 M", "memory": "~1 GB", "speed": "~10x"},
+    "base": {"parameters": "74 M", "memory": "~1 GB", "speed": "~7x"},
+    "base.en": {"parameters": "74 M", "memory": "~1 GB", "speed": "~7x"},
+    "small": {"parameters": "244 M", "memory": "~2 GB", "speed": "~4x"},
+    "small.en": {"parameters": "244 M", "memory": "~2 GB", "speed": "~4x"},
+    "medium": {"parameters": "769 M", "memory": "~5 GB", "speed": "~2x"},
+    "medium.en": {"parameters": "769 M", "memory": "~5 GB", "speed": "~2x"},
+    "turbo": {"parameters": "809 M", "memory": "~6 GB", "speed": "~8x"},
+    "large": {"parameters": "1550 M", "memory": "~10 GB", "speed": "1x"},
+}
+DEFAULT_MODEL = "tiny"
+# int8: dynamic quantization of the linear layers, CPU only
+PRECISIONS = ["fp32", "fp16", "int8"]
+DEFAULT_PRECISION = "fp32"
+# quantized models are saved here once, later loads read them instead of quantizing again
+QUANTIZED_DIR = ".openverbum-models"
+# "auto" uses the GPU when there is one
+DEVICES = ["auto", "cpu", "cuda"]
+DEFAULT_DEVICE = "auto"
+# torch threads (0 = torch default)
+TORCH_THREADS = 0
+# where models are downloaded (None = whisper default, ~/.cache/whisper)
+MODEL_DIR = None
+# measured load time and memory of every model used
+MODEL_STATS_FILE = "model-stats.json"
+
+# jobs.py
+# Jobs running at the same time, each one has its own backend worker (and model in memory)
+MAX_CONCURRENT_JOBS = 1
+JOB_RETRIES = 1
+# every job attempt gets its own temporary folder
+JOB_DIR_PREFIX = "openverbum-job-"
+# jobs running longer are stopped (None = no limit)
+JOB_TIMEOUT_SECONDS = None
+# seconds a worker gets to exit by itself before it's killed
+WORKER_STOP_TIMEOUT = 5
+# longest message line read from a worker (the transcript of a long file is a single line)
+WORKER_LINE_LIMIT = 64 * 1024 * 1024
+
+# journal.py
+# finalized segments of running jobs, so they can be resumed (jobs with "resume": false
+# start from zero)
+RESUME_ENABLED = True
+JOURNAL_DIR = ".openverbum-journal"
+# journals of jobs that were never resumed are removed after this
+JOURNAL_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+# chunking.py
+# Files shorter than this are not split
+CHUNK_MIN_SECONDS = 120
+CHUNK_SECONDS = 60
+# Chunk boundaries are moved to the quietest point within this distance
+CHUNK_SEARCH_SECONDS = 5
+# Processes transcribing chunks in parallel (1 = no chunking). 0 = automatic: one per
+# CHUNK_THREADS_PER_WORKER cores, as many as fit in the free memory (see chunking.py)
+CHUNK_WORKERS = 0
+CHUNK_THREADS_PER_WORKER = 2
+CHUNK_MAX_WORKERS = 8
+# memory of a chunk process besides its model weights (interpreter, torch, activations)
+CHUNK_WORKER_OVERHEAD_MB = 500
+
+# windowed.py
+# Bounded memory: long files are decoded and transcribed in windows. Used when there is
+# a memory limit (MB of the worker process, None = no limit) or the file is longer than
+# WINDOWED_MIN_SECONDS
+MEMORY_LIMIT_MB = None
+WINDOWED_MIN_SECONDS = 2 * 3600
+WINDOW_SECONDS = 600
+WINDOW_MIN_SECONDS = 60
+# memory per second of window: the samples, their pre-processed copy and whisper's mel
+WINDOW_BYTES_PER_SECOND = 3 * 4 * SAMPLE_RATE
+
+# batching.py
+# Clips up to BATCH_MAX_SECONDS (one whisper window) are transcribed together, up to
+# BATCH_GROUP_SIZE clips per job. Batched clips have no word timestamps, so it's only
+# done when asked for (--batch)
+BATCH_ENABLED = False
+BATCH_MAX_SECONDS = 30
+BATCH_GROUP_SIZE = 64
+# clips decoded at once: as many as fit in this fraction of the free memory
+BATCH_MEMORY_FRACTION = 0.5
+BATCH_MAX_SIZE = 32
+# when the free memory is unknown
+BATCH_DEFAULT_SIZE = 8
+# whisper's defaults: clips over these are transcribed one by one (temperature fallback)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# streaming.py
+# Audio read per step, the latency is about this plus the transcription time of the buffer
+STREAM_STEP_SECONDS = 2.0
+# Trailing audio kept as "partial", transcribed again on the next step
+STREAM_OVERLAP_SECONDS = 4.0
+STREAM_MAX_BUFFER_SECONDS = 20.0
+# A followed file is considered finished after this long without new data
+STREAM_IDLE_TIMEOUT = 5.0
+STREAM_POLL_SECONDS = 0.1
+
+# cache.py
+CACHE_ENABLED = True
+CACHE_DIR = ".openverbum-cache"
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+# file fingerprint: blocks read from the media file, besides the first and last ones
+FINGERPRINT_BLOCKS = 8
+FINGERPRINT_BLOCK_BYTES = 64 * 1024
+CACHE_HIT_MSG = "Cached transcript found"
+CACHE_MISS_MSG = "Not in cache, transcribing"
+
+# progress.py
+# GUI progress updates per second (per job)
+PROGRESS_UPDATES_PER_SECOND = 4
+# weight of the newest speed measure in the ETA moving average
+ETA_SMOOTHING = 0.3
+ETA_MIN_SAMPLE_SECONDS = 0.5
+
+# logs.py
+# one JSON line per backend span and per finished job
+METRICS_FILE = "openverbum-metrics.log"
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+METRICS_BACKUPS = 3
@@ -0,0 +1,97 @@
+# Locals
+import asyncio
+import os
+from concurrent.futures import Future
+from threading import Thread
+from typing import Callable, Coroutine
+
+# Backend
+import backend.config as CONFIG
+
+
+class EventLoopThread:
+    """
+    The asyncio event loop of the wrapper, running in its own thread.
+
+    Backend workers, jobs and their output files are all coroutines on this loop, so one
+    thread supervises every worker. Other threads (the GUI, the CLI) use run() and call(),
+    and the loop talks back through the signals: Qt queues signals emitted from another
+    thread to the GUI thread, which is the bridge between both event loops.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self._run, daemon=True, name="openverbum-event-loop")
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+
+    def run(self, coroutine: Coroutine) -> Future:
+        # Schedules a coroutine from any thread, the future has its result
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call(self, callback: Callable, *args) -> None:
+        # Calls callback(*args) in the loop thread
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self) -> None:
+        if not self.loop.is_running():
+            return
+        self.run(self._shutdown())
+        self.thread.join(timeout=CONFIG.WORKER_STOP_TIMEOUT)
+
+    async def _shutdown(self) -> None:
+        # Cancels what is still waiting (dispatchers of the job queue), then stops the loop
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.loop.stop()
+
+
+class AsyncWriter:
+    """
+    Text file written from the event loop without blocking it.
+    write() and sync() only queue the work, a task writes it in the default executor,
+    in order. close() waits until everything is written.
+    """
+
+    def __init__(self, path: str, mode: str = "w"):
+        self.file = open(path, mode)
+        self.pending: list[str] = []
+        self.sync_requested = False
+        self.task: asyncio.Task | None = None
+
+    def write(self, text: str) -> None:
+        self.pending.append(text)
+        self._schedule()
+
+    def sync(self) -> None:
+        # Flush and fsync after what was written until now
+        self.sync_requested = True
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.pending or self.sync_requested:
+            text, self.pending = "".join(self.pending), []
+            sync, self.sync_requested = self.sync_requested, False
+            await loop.run_in_executor(None, self._write, text, sync)
+
+    def _write(self, text: str, sync: bool) -> None:
+        self.file.write(text)
+        if sync:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    async def close(self) -> None:
+        if self.task is not None:
+            await self.task
+        await asyncio.get_running_loop().run_in_executor(None, self.file.close)
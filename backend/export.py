@@ -0,0 +1,149 @@
+"""
+Transcript export: txt, SRT, WebVTT, TSV, JSON (with word timestamps) and a compact
+binary format (.ovb) for big archives.
+All the requested formats are built in a single pass over the segments, and every
+file is written at once.
+
+.ovb layout (zlib compressed, little endian):
+    b"OVB1", language (u16 length + utf-8), segment count (u32), then per segment:
+    start, end (f32), text (u32 length + utf-8), word count (u32), then per word:
+    start, end, probability (f32), word (u16 length + utf-8)
+"""
+# Libraries
+import json
+import struct
+import zlib
+
+FORMATS = ["txt", "srt", "vtt", "tsv", "json", "ovb"]
+MAGIC = b"OVB1"
+WRITE_BUFFER = 1 << 20
+
+
+def format_timestamp(seconds: float, decimal_marker: str = ".") -> str:
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def _pack_string(text: str, length_format: str) -> bytes:
+    encoded = text.encode("utf-8")
+    return struct.pack(length_format, len(encoded)) + encoded
+
+
+def build_exports(
+    segments: list[dict], language: str | None, formats: list[str] = FORMATS
+) -> dict[str, bytes]:
+    # format -> file content
+    parts: dict[str, list] = {fmt: [] for fmt in formats}
+    if "vtt" in parts:
+        parts["vtt"].append("WEBVTT\n\n")
+    if "tsv" in parts:
+        parts["tsv"].append("start\tend\ttext\n")
+    if "ovb" in parts:
+        parts["ovb"] += [
+            MAGIC,
+            _pack_string(language or "", "<H"),
+            struct.pack("<I", len(segments)),
+        ]
+
+    for index, segment in enumerate(segments, start=1):
+        text = segment["text"].strip()
+        start, end = segment["start"], segment["end"]
+
+        if "txt" in parts:
+            parts["txt"].append(f"{text}\n")
+        if "srt" in parts:
+            parts["srt"].append(
+                f"{index}\n{format_timestamp(start, ',')} --> {format_timestamp(end, ',')}\n"
+                f"{text}\n\n"
+            )
+        if "vtt" in parts:
+            parts["vtt"].append(
+                f"{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n"
+            )
+        if "tsv" in parts:
+            # milliseconds, like whisper's own tsv output
+            tsv_text = text.replace("\t", " ")
+            parts["tsv"].append(f"{round(start * 1000)}\t{round(end * 1000)}\t{tsv_text}\n")
+        if "ovb" in parts:
+            words = segment.get("words", [])
+            parts["ovb"] += [
+                struct.pack("<ff", start, end),
+                _pack_string(text, "<I"),
+                struct.pack("<I", len(words)),
+            ]
+            for word in words:
+                parts["ovb"] += [
+                    struct.pack("<fff", word["start"], word["end"], word.get("probability", 0)),
+                    _pack_string(word["word"], "<H"),
+                ]
+
+    exports = {
+        fmt: "".join(parts[fmt]).encode("utf-8")
+        for fmt in ("txt", "srt", "vtt", "tsv")
+        if fmt in parts
+    }
+    if "json" in parts:
+        exports["json"] = json.dumps(
+            {"language": language, "segments": segments}, ensure_ascii=False
+        ).encode("utf-8")
+    if "ovb" in parts:
+        exports["ovb"] = zlib.compress(b"".join(parts["ovb"]))
+    return exports
+
+
+def export_transcript(
+    segments: list[dict], language: str | None, base_path: str, formats: list[str] = FORMATS
+) -> dict[str, str]:
+    # Writes base_path.<format> for every format, returns format -> path
+    paths = {}
+    for fmt, content in build_exports(segments, language, formats).items():
+        path = f"{base_path}.{fmt}"
+        with open(path, "wb", buffering=WRITE_BUFFER) as export_file:
+            export_file.write(content)
+        paths[fmt] = path
+    return paths
+
+
+def read_binary(path: str) -> dict:
+    # Reads an .ovb file back to {"language", "segments"}
+    with open(path, "rb") as binary_file:
+        data = zlib.decompress(binary_file.read())
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not an OpenVerbum binary transcript")
+
+    position = 4
+
+    def unpack(fmt: str) -> tuple:
+        nonlocal position
+        values = struct.unpack_from(fmt, data, position)
+        position += struct.calcsize(fmt)
+        return values
+
+    def unpack_string(length_format: str) -> str:
+        nonlocal position
+        (length,) = unpack(length_format)
+        position += length
+        return data[position - length : position].decode("utf-8")
+
+    language = unpack_string("<H") or None
+    segments = []
+    for _ in range(unpack("<I")[0]):
+        start, end = unpack("<ff")
+        text = unpack_string("<I")
+        words = []
+        for _ in range(unpack("<I")[0]):
+            word_start, word_end, probability = unpack("<fff")
+            words.append(
+                {
+                    "word": unpack_string("<H"),
+                    "start": word_start,
+                    "end": word_end,
+                    "probability": probability,
+                }
+            )
+        segments.append({"start": start, "end": end, "text": text, "words": words})
+
+    return {"language": language, "segments": segments}
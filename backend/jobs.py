@@ -0,0 +1,230 @@
+# Locals
+import asyncio
+import itertools
+import shutil
+import tempfile
+import time
+from enum import Enum
+from threading import Lock
+from typing import Callable
+
+# Backend
+import backend.config as CONFIG
+from backend.event_loop import EventLoopThread
+from backend.progress import ProgressTracker
+
+
+class JobState(Enum):
+    QUEUED = "queued"
+    EXTRACTING = "extracting"
+    TRANSCRIBING = "transcribing"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATES = (JobState.DONE, JobState.FAILED, JobState.CANCELLED)
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        file_path: str,
+        file_type: str,
+        language: str | None,
+        task: str,
+        model: str = CONFIG.DEFAULT_MODEL,
+        options: dict | None = None,
+    ):
+        self.id = next(Job._ids)
+        self.file_path = file_path
+        self.file_type = file_type
+        self.language = language
+        self.task = task
+        self.model = model
+        # extra backend options, sent as they are (e.g. chunk_workers)
+        self.options = options or {}
+
+        self.state = JobState.QUEUED
+        self.attempts = 0
+        self.error = ""
+        # seconds of audio, as reported by the backend
+        self.duration: float = 0
+        # 0-100
+        self.progress = 0
+        self.tracker = ProgressTracker()
+        self.output_path = ""
+        # format -> exported file (see backend/export.py)
+        self.exports: dict[str, str] = {}
+        # scratch folder of the current attempt, removed when it finishes
+        self.workdir = ""
+        # time.monotonic() of the start of the attempt
+        self.started_at: float = 0
+        # queue slot running the job
+        self.slot: int | None = None
+        # cancelled and timed out jobs are not retried
+        self.cancelled = False
+        self.timed_out = False
+        # full transcript, with word timestamps (see the "transcript" message)
+        self.segments: list[dict] = []
+        self.detected_language: str | None = None
+        # probability of detected_language, only for language identification jobs
+        self.language_confidence: float | None = None
+        # peak memory of the backend worker during the job (see the "job" span)
+        self.peak_rss_mb: float | None = None
+        # journal of the current attempt (see backend/journal.py), and what it resumed
+        self.journal = None
+        self.resumed_from: float = 0
+        self.resumed_segments: list[dict] = []
+        # batch jobs: the jobs of their clips, transcribed together (see backend/batching.py).
+        # Every clip job has its batch job as group
+        self.clips: list[Job] = []
+        self.group: Job | None = None
+
+    def start_attempt(self) -> None:
+        # nothing is kept from a previous attempt
+        self.attempts += 1
+        self.progress = 0
+        self.duration = 0
+        self.tracker = ProgressTracker()
+        self.segments = []
+        self.exports = {}
+        self.peak_rss_mb = None
+        self.started_at = time.monotonic()
+
+    def to_message(self) -> dict:
+        # What the backend worker receives (see backend/worker.py)
+        return {
+            "path": self.file_path,
+            "file_type": self.file_type,
+            "language": self.language,
+            "task": self.task,
+            "model": self.model,
+            "workdir": self.workdir,
+            **self.options,
+        }
+
+
+class JobQueue:
+    """
+    Runs jobs with at most `concurrency` of them at the same time.
+    Every slot has its own dispatcher coroutine on the event loop, so a slot processes its
+    jobs in order. Failed jobs are queued again up to `retries` times.
+
+    run_job(job, slot) -> (succeeded, error) is a coroutine doing the actual work.
+    on_state(job) is called every time a job changes state.
+    on_idle(jobs) is called when all jobs submitted since the queue was last idle finished.
+    stop_job(job) must make run_job return as soon as possible (used to cancel).
+    submit() and cancel() can be called from any thread, the callbacks are called from the
+    event loop thread (and from the caller's thread for jobs cancelled while queued).
+    """
+
+    def __init__(
+        self,
+        run_job: Callable,
+        on_state: Callable,
+        on_idle: Callable,
+        stop_job: Callable,
+        loop: EventLoopThread,
+        concurrency: int = CONFIG.MAX_CONCURRENT_JOBS,
+        retries: int = CONFIG.JOB_RETRIES,
+    ):
+        self.run_job = run_job
+        self.on_state = on_state
+        self.on_idle = on_idle
+        self.stop_job = stop_job
+        self.loop = loop
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+
+        # only used from the event loop thread
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.lock = Lock()
+        # jobs of the current batch
+        self.batch: list[Job] = []
+        self.dispatchers = [self.loop.run(self._dispatch(slot)) for slot in range(self.concurrency)]
+
+    def submit(self, job: Job) -> Job:
+        with self.lock:
+            self.batch.append(job)
+        self.set_state(job, JobState.QUEUED)
+        self.loop.call(self.pending.put_nowait, job)
+        return job
+
+    def cancel(self, job: Job) -> None:
+        with self.lock:
+            if job.state in FINISHED_STATES or job.cancelled:
+                return
+            job.cancelled = True
+            is_running = job.state != JobState.QUEUED
+
+        if is_running:
+            # the dispatcher sets the state once run_job returns
+            self.stop_job(job)
+            return
+
+        self.set_state(job, JobState.CANCELLED)
+        self._check_idle()
+
+    def cancel_all(self) -> None:
+        with self.lock:
+            jobs = list(self.batch)
+        for job in jobs:
+            self.cancel(job)
+
+    def set_state(self, job: Job, state: JobState) -> None:
+        job.state = state
+        self.on_state(job)
+
+    def batch_progress(self) -> int:
+        with self.lock:
+            if not self.batch:
+                return 0
+            return int(sum(job.progress for job in self.batch) / len(self.batch))
+
+    async def _dispatch(self, slot: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job: Job = await self.pending.get()
+            with self.lock:
+                # cancelled while it was queued
+                if job.cancelled:
+                    continue
+                job.state = JobState.EXTRACTING
+                job.slot = slot
+            job.start_attempt()
+            job.workdir = tempfile.mkdtemp(prefix=CONFIG.JOB_DIR_PREFIX)
+            self.set_state(job, JobState.EXTRACTING)
+
+            try:
+                succeeded, error = await self.run_job(job, slot)
+            except Exception as exception:
+                succeeded, error = False, str(exception)
+            finally:
+                workdir, job.workdir = job.workdir, ""
+                await loop.run_in_executor(None, shutil.rmtree, workdir, True)
+
+            if succeeded:
+                job.progress = 100
+                self.set_state(job, JobState.DONE)
+            elif job.cancelled:
+                job.error = error
+                self.set_state(job, JobState.CANCELLED)
+            elif job.attempts <= self.retries and not job.timed_out:
+                self.set_state(job, JobState.QUEUED)
+                self.pending.put_nowait(job)
+                continue
+            else:
+                job.error = error
+                self.set_state(job, JobState.FAILED)
+
+            self._check_idle()
+
+    def _check_idle(self) -> None:
+        with self.lock:
+            if not all(job.state in FINISHED_STATES for job in self.batch):
+                return
+            finished, self.batch = self.batch, []
+        self.on_idle(finished)
@@ -0,0 +1,135 @@
+# Locals
+import hashlib
+import json
+import os
+import time
+
+# Backend
+import backend.config as CONFIG
+from backend.event_loop import AsyncWriter
+
+
+class Journal:
+    """
+    Per-job record of the finalized segments, so a job can continue where it stopped
+    (worker crash, retry, or the app closed in the middle of a long file).
+
+    JSON lines, appended as messages arrive:
+        {"segment": {...}}, {"language": "English"} and {"checkpoint": seconds}
+    A checkpoint means every segment before that point of the audio is in the journal,
+    the worker is sent that offset to resume from. Segments after the last checkpoint
+    are transcribed again.
+    Once open() returns, records are written from the event loop (see AsyncWriter).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file: AsyncWriter | None = None
+
+    @classmethod
+    def for_job(cls, job) -> "Journal":
+        # Same file, model and options: same journal, even in another session.
+        # Size and modification time tell if the file changed since
+        stat = os.stat(job.file_path)
+        identity = {
+            "path": os.path.abspath(job.file_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "model": job.model,
+            "language": job.language,
+            "task": job.task,
+            "precision": job.options.get("precision"),
+            "preprocess": job.options.get("preprocess", CONFIG.PREPROCESS_ENABLED),
+        }
+        digest = hashlib.blake2b(json.dumps(identity, sort_keys=True).encode(), digest_size=16)
+        return cls(os.path.join(CONFIG.JOURNAL_DIR, f"{digest.hexdigest()}.jsonl"))
+
+    def load(self) -> dict:
+        # {"offset", "segments", "language"} of the last checkpoint (offset 0 if there is none)
+        state = {"offset": 0.0, "segments": [], "language": None}
+        segments: list[dict] = []
+        language = None
+        try:
+            with open(self.path) as journal_file:
+                for line in journal_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # last line cut by a crash
+                        break
+                    if "segment" in record:
+                        segments.append(record["segment"])
+                    elif "language" in record:
+                        language = record["language"]
+                    elif "checkpoint" in record:
+                        state = {
+                            "offset": record["checkpoint"],
+                            "segments": list(segments),
+                            "language": language,
+                        }
+        except OSError:
+            pass
+        return state
+
+    def open(self, state: dict) -> None:
+        # Starts again from a load() result, dropping what came after its checkpoint.
+        # Written to a temporary file first, so a crash now doesn't lose the old journal.
+        # Blocking, run it outside of the event loop
+        os.makedirs(CONFIG.JOURNAL_DIR, exist_ok=True)
+        records = [{"language": state["language"]}] if state["language"] is not None else []
+        records.extend({"segment": segment} for segment in state["segments"])
+        records.append({"checkpoint": state["offset"]})
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as temp_file:
+            temp_file.writelines(self.encode(record) for record in records)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, self.path)
+        self.file = AsyncWriter(self.path, "a")
+
+    @staticmethod
+    def encode(record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    def write(self, record: dict) -> None:
+        if self.file is not None:
+            self.file.write(self.encode(record))
+
+    def add_segment(self, segment: dict) -> None:
+        self.write({"segment": segment})
+
+    def set_language(self, language: str) -> None:
+        self.write({"language": language})
+
+    def checkpoint(self, seconds: float) -> None:
+        if self.file is None:
+            return
+        self.write({"checkpoint": seconds})
+        # on disk as soon as possible, this is what survives a crash
+        self.file.sync()
+
+    async def close(self) -> None:
+        if self.file is not None:
+            file, self.file = self.file, None
+            await file.close()
+
+    async def remove(self) -> None:
+        await self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def prune_journals(max_age: float = CONFIG.JOURNAL_MAX_AGE_SECONDS) -> None:
+    # Journals of jobs that were never resumed
+    try:
+        entries = list(os.scandir(CONFIG.JOURNAL_DIR))
+    except OSError:
+        return
+
+    oldest = time.time() - max_age
+    for entry in entries:
+        if entry.name.endswith(".jsonl") and entry.stat().st_mtime < oldest:
+            os.remove(entry.path)
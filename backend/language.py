@@ -0,0 +1,121 @@
+"""
+Language identification without a full transcription.
+Only a few windows of LANGUAGE_WINDOW_SECONDS are decoded (ffmpeg seeks to each one),
+whisper's language detection runs once per window and the probabilities are averaged,
+so an intro with music or another language is outvoted by the rest of the file.
+Results are kept in the transcript cache, keyed on the file fingerprint and the model.
+"""
+from typing import Optional
+
+import numpy as np
+import whisper
+
+# # this import is relative, because language.py is used by the backend subprocess
+import cache
+import config as CONFIG
+import protocol
+from audio import audio_duration, decode_audio
+from models import get_model
+from probe import probe_media
+from telemetry import span
+
+
+def language_probabilities(model: whisper.Whisper, audio: np.ndarray) -> dict[str, float]:
+    # language code -> probability, from the first 30 seconds of audio (one whisper window)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels)
+    _, probs = model.detect_language(mel.to(model.device))
+    return probs
+
+
+def language_name(code: str) -> str:
+    return whisper.tokenizer.LANGUAGES[code].title()
+
+
+def detect_language(model: whisper.Whisper, audio: np.ndarray) -> str:
+    # Same as whisper does on its own: first 30 seconds. Used before transcribing
+    probs = language_probabilities(model, audio)
+    language = max(probs, key=probs.get)
+    protocol.send(protocol.LANGUAGE, language=language_name(language))
+    return language
+
+
+def window_offsets(
+    duration: float, windows: int, seconds: float = CONFIG.LANGUAGE_WINDOW_SECONDS
+) -> list[float]:
+    # Start of every window: the first one at 0, the last one ending with the file
+    if windows <= 1 or duration <= seconds:
+        return [0.0]
+    windows = min(windows, int(duration // seconds))
+    if windows <= 1:
+        return [0.0]
+    step = (duration - seconds) / (windows - 1)
+    return [round(step * index, 3) for index in range(windows)]
+
+
+def vote(window_probs: list[dict[str, float]]) -> Optional[dict]:
+    # Averages the probabilities of every window, None if no window voted
+    if not window_probs:
+        return None
+
+    totals: dict[str, float] = {}
+    for probs in window_probs:
+        for code, probability in probs.items():
+            totals[code] = totals.get(code, 0.0) + probability
+    averages = {code: total / len(window_probs) for code, total in totals.items()}
+    ranked = sorted(averages, key=averages.get, reverse=True)
+
+    return {
+        "language": language_name(ranked[0]),
+        "code": ranked[0],
+        "confidence": round(averages[ranked[0]], 4),
+        "windows": len(window_probs),
+        "top": [[code, round(averages[code], 4)] for code in ranked[: CONFIG.LANGUAGE_TOP]],
+    }
+
+
+def identify_language(
+    file_path: str,
+    options: dict,
+    windows: int = CONFIG.LANGUAGE_WINDOWS,
+    use_cache: bool = CONFIG.CACHE_ENABLED,
+    media: Optional[dict] = None,
+) -> Optional[dict]:
+    # Sends and returns the result of vote(), or None when the file is silent.
+    # media is the probe_media() result when the caller already has it
+    key = cache.language_key(file_path, options, windows) if use_cache else None
+    result = cache.load(key) if key is not None else None
+    if result is not None:
+        protocol.send(protocol.INFO, message=CONFIG.CACHE_HIT_MSG)
+        protocol.send(protocol.LANGUAGE, **result)
+        return result
+
+    media = media or probe_media(file_path)
+    if media["audio"] is None:
+        raise ValueError(CONFIG.NO_AUDIO_MSG)
+
+    protocol.send(protocol.LANGUAGE, language=None)
+    model = get_model(options)
+    seconds = CONFIG.LANGUAGE_WINDOW_SECONDS
+    # unknown duration (e.g. some raw streams): only the first window
+    duration = media["duration"] or 0
+    window_probs = []
+    with span("language") as record:
+        record["audio_seconds"] = 0.0
+        for offset in window_offsets(duration, windows, seconds):
+            audio = decode_audio(
+                file_path, start=offset, duration=seconds, stream=media["audio"]["stream"]
+            )
+            record["audio_seconds"] += audio_duration(audio)
+            if not audio.shape[0] or np.sqrt(np.mean(audio**2)) < CONFIG.LANGUAGE_MIN_RMS:
+                continue
+            window_probs.append(language_probabilities(model, audio))
+
+    result = vote(window_probs)
+    if result is None:
+        protocol.send(protocol.INFO, message="No speech found to identify the language")
+        return None
+
+    if key is not None:
+        cache.store_entry(key, result)
+    protocol.send(protocol.LANGUAGE, **result)
+    return result
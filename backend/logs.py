@@ -0,0 +1,36 @@
+# Locals
+import json
+import logging
+import time
+from logging.handlers import RotatingFileHandler
+
+# Backend
+import backend.config as CONFIG
+
+# backend worker output, shown when verbose
+logger = logging.getLogger("openverbum")
+# spans and job summaries, always written to METRICS_FILE
+metrics_logger = logging.getLogger("openverbum.metrics")
+
+
+def setup_logging(verbose: bool) -> None:
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+    if not metrics_logger.handlers:
+        handler = RotatingFileHandler(
+            CONFIG.METRICS_FILE,
+            maxBytes=CONFIG.METRICS_MAX_BYTES,
+            backupCount=CONFIG.METRICS_BACKUPS,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        metrics_logger.addHandler(handler)
+        metrics_logger.setLevel(logging.INFO)
+        # metrics go to the file only
+        metrics_logger.propagate = False
+
+
+def log_metrics(kind: str, **fields) -> None:
+    metrics_logger.info(
+        json.dumps({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "kind": kind, **fields})
+    )
@@ -0,0 +1,249 @@
+"""
+Model loading with the configurable options (see MODELS in config.py):
+device, precision, torch threads and download/cache folder.
+The "int8" precision quantizes the linear layers (most of the weights and of the CPU time)
+to int8 when the model is loaded, and saves the result in QUANTIZED_DIR: quantizing
+takes longer than loading, so it's only done once per model. Only tensors are saved and
+read (weights_only), a file placed there can't run code in the worker.
+Every load is measured (time and memory) and saved to MODEL_STATS_FILE, so the GUI
+and the CLI can show what each model costs on this machine.
+"""
+import dataclasses
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+import torch
+import whisper
+from torch.ao.nn.quantized.dynamic import Linear as QuantizedLinear
+from torch.ao.quantization import quantize_dynamic
+
+# # this import is relative, because models.py is used by the backend subprocess
+import config as CONFIG
+import protocol
+from resources import rss_mb
+from telemetry import span
+
+# loaded model, by load options. Only the one of the last job is kept
+LOADED: dict = {}
+
+
+def model_options(
+    name: Optional[str] = None,
+    device: Optional[str] = None,
+    precision: Optional[str] = None,
+    threads: Optional[int] = None,
+    model_dir: Optional[str] = None,
+) -> dict:
+    # Load options with the defaults of config.py, e.g. from a job message
+    name = name or CONFIG.DEFAULT_MODEL
+    if name not in CONFIG.MODELS:
+        raise ValueError(f"Unknown model {name} (use {', '.join(CONFIG.MODELS)})")
+    precision = precision or CONFIG.DEFAULT_PRECISION
+    if precision not in CONFIG.PRECISIONS:
+        raise ValueError(f"Unknown precision {precision} (use {', '.join(CONFIG.PRECISIONS)})")
+    # quantized layers only run on CPU
+    if precision == "int8":
+        device = "cpu"
+
+    return {
+        "name": name,
+        "device": resolve_device(device or CONFIG.DEFAULT_DEVICE),
+        "precision": precision,
+        "threads": threads or CONFIG.TORCH_THREADS,
+        "model_dir": model_dir or CONFIG.MODEL_DIR,
+    }
+
+
+def resolve_device(device: str) -> str:
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def uses_fp16(options: dict) -> bool:
+    # whisper only runs fp16 on GPU
+    return options["precision"] == "fp16" and options["device"] != "cpu"
+
+
+def quantized_path(options: dict) -> str:
+    # The saved state is only read by the same versions of torch and whisper
+    name = f"{options['name']}-int8-torch{torch.__version__}-whisper{whisper.__version__}.pt"
+    return os.path.join(CONFIG.QUANTIZED_DIR, name)
+
+
+def quantize_model(model: whisper.Whisper) -> whisper.Whisper:
+    # Dynamic quantization: int8 weights, activations quantized on the fly.
+    # whisper's Linear only adds a dtype cast (for fp16), quantize_dynamic wants plain
+    # nn.Linear modules
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def save_quantized(model: whisper.Whisper, path: str) -> None:
+    # Only tensors are saved (no pickled modules), so loading the file can't run code.
+    # Buffers that are not in the state_dict (whisper's attention mask and alignment
+    # heads) are saved apart
+    state = model.state_dict()
+    saved = {
+        "dims": dataclasses.asdict(model.dims),
+        "state": state,
+        "buffers": {name: value for name, value in model.named_buffers() if name not in state},
+    }
+    write_atomically(path, lambda model_file: torch.save(saved, model_file), "wb")
+
+
+def read_quantized(path: str) -> whisper.Whisper:
+    saved = torch.load(path, map_location="cpu", weights_only=True)
+    # built like whisper.load_model does, with empty int8 linear layers instead of
+    # quantizing the initial weights: they are all replaced by the saved state
+    model = whisper.model.Whisper(whisper.model.ModelDimensions(**saved["dims"]))
+    for module in list(model.modules()):
+        for name, child in module.named_children():
+            if isinstance(child, torch.nn.Linear):
+                linear = QuantizedLinear(
+                    child.in_features, child.out_features, child.bias is not None, torch.qint8
+                )
+                setattr(module, name, linear)
+
+    model.load_state_dict(saved["state"])
+    for name, value in saved["buffers"].items():
+        module_name, _, buffer_name = name.rpartition(".")
+        model.get_submodule(module_name).register_buffer(buffer_name, value, persistent=False)
+    return model
+
+
+def load_quantized(options: dict) -> tuple[whisper.Whisper, bool]:
+    # Returns the int8 model and whether it was read from QUANTIZED_DIR
+    path = quantized_path(options)
+    if os.path.exists(path):
+        try:
+            return read_quantized(path), True
+        except Exception as exception:
+            # cut by a crash, or not a saved state: quantized again and replaced below
+            protocol.send(protocol.INFO, message=f"Quantizing the model again ({exception})")
+
+    model = whisper.load_model(options["name"], device="cpu", download_root=options["model_dir"])
+    model = quantize_model(model)
+    # other processes (workers, chunk pool) may save it at the same time, the last one
+    # replaces the file (see write_atomically)
+    os.makedirs(CONFIG.QUANTIZED_DIR, exist_ok=True)
+    save_quantized(model, path)
+    return model, False
+
+
+def write_atomically(path: str, write: Callable, mode: str = "w") -> None:
+    # write(file) goes to a temporary file of this process, then replaces path. Processes
+    # writing the same path at the same time don't mix their data, the last one wins
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(handle, mode) as temp_file:
+            write(temp_file)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def weights_mb(model: whisper.Whisper) -> float:
+    # Quantized weights are not parameters of the model, they are counted apart
+    total = sum(p.numel() * p.element_size() for p in model.parameters())
+    for module in model.modules():
+        if isinstance(module, QuantizedLinear):
+            weight, bias = module.weight(), module.bias()
+            total += weight.numel() * weight.element_size()
+            if bias is not None:
+                total += bias.numel() * bias.element_size()
+    return round(total / (1024 * 1024), 1)
+
+
+def load_model(options: dict) -> tuple[whisper.Whisper, dict]:
+    # Returns the model and the measured stats
+    if options["threads"]:
+        torch.set_num_threads(options["threads"])
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    cached = False
+    if options["precision"] == "int8":
+        model, cached = load_quantized(options)
+    else:
+        model = whisper.load_model(
+            options["name"], device=options["device"], download_root=options["model_dir"]
+        )
+        if uses_fp16(options):
+            model = model.half()
+    load_seconds = time.perf_counter() - start
+
+    stats = {
+        "name": options["name"],
+        "device": options["device"],
+        "precision": options["precision"],
+        "load_seconds": round(load_seconds, 3),
+        "weights_mb": weights_mb(model),
+        "rss_mb": round(rss_mb() - rss_before, 1),
+        # int8 models read from QUANTIZED_DIR
+        "cached": cached,
+    }
+    return model, stats
+
+
+def save_stats(stats: dict) -> None:
+    # last measure of every (model, device, precision)
+    all_stats = read_stats()
+    all_stats[f"{stats['name']}/{stats['device']}/{stats['precision']}"] = stats
+
+    write_atomically(
+        CONFIG.MODEL_STATS_FILE, lambda stats_file: json.dump(all_stats, stats_file, indent=2)
+    )
+
+
+def read_stats() -> dict:
+    try:
+        with open(CONFIG.MODEL_STATS_FILE) as stats_file:
+            return json.load(stats_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_model(options: dict) -> whisper.Whisper:
+    # The model stays in memory until a job needs another one.
+    # The threads are not part of the model, they are set again below
+    key = tuple(sorted((name, value) for name, value in options.items() if name != "threads"))
+    if key not in LOADED:
+        # another model (or device, precision...): the previous one is freed first,
+        # so switching models doesn't keep both in memory
+        LOADED.clear()
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        with span("model_load"):
+            model, stats = load_model(options)
+        try:
+            save_stats(stats)
+        except OSError as error:
+            # only informative, the job goes on
+            print(f"Model stats not saved: {error}", file=sys.stderr)
+        protocol.send(protocol.MODEL, **stats)
+        LOADED[key] = model
+    elif options["threads"]:
+        torch.set_num_threads(options["threads"])
+    return LOADED[key]
+
+
+def warm_up(options: dict) -> whisper.Whisper:
+    # Loads the model and runs the encoder once on silence: the first forward pass also
+    # pays for memory allocation and kernel selection, better before the first job
+    model = get_model(options)
+    with span("warmup"), torch.no_grad():
+        silence = torch.zeros(whisper.audio.N_SAMPLES)
+        mel = whisper.log_mel_spectrogram(silence, model.dims.n_mels)
+        dtype = next(model.parameters()).dtype
+        model.embed_audio(mel.unsqueeze(0).to(model.device, dtype=dtype))
+    return model
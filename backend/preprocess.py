@@ -0,0 +1,123 @@
+"""
+Pre-processing of the decoded audio, between extraction and transcription.
+Long silent stretches are cut out (Whisper's cost grows with the audio length, and it tends
+to make up text in silence) and the loudness is normalized. The audio is already at
+SAMPLE_RATE, ffmpeg resamples it once while decoding (see audio.py).
+
+Cutting changes the timeline, so a TimeMap is kept to move the timestamps of the
+transcript back to the original media.
+"""
+import numpy as np
+
+# # this import is relative, because preprocess.py is used by the backend subprocess
+import config as CONFIG
+from audio import frame_energy
+
+
+class TimeMap:
+    """
+    Times of the trimmed audio to times of the original media.
+    Region i of the trimmed audio starts at trimmed_starts[i] and was at
+    original_starts[i] in the original one (both in seconds, sorted).
+    """
+
+    def __init__(self, trimmed_starts, original_starts):
+        self.trimmed_starts = np.asarray(trimmed_starts, dtype=np.float64)
+        self.original_starts = np.asarray(original_starts, dtype=np.float64)
+
+    @classmethod
+    def identity(cls) -> "TimeMap":
+        return cls([0.0], [0.0])
+
+    def shifted(self, offset: float) -> "TimeMap":
+        # Same map for audio that started at offset in the original media (resumed jobs)
+        return TimeMap(self.trimmed_starts, self.original_starts + offset)
+
+    @property
+    def removed_seconds(self) -> float:
+        return float(self.original_starts[-1] - self.trimmed_starts[-1])
+
+    def to_original(self, seconds: float, end: bool = False) -> float:
+        # The end of a segment that touches a cut stays before the cut
+        side = "left" if end else "right"
+        index = max(int(np.searchsorted(self.trimmed_starts, seconds, side=side)) - 1, 0)
+        return float(self.original_starts[index] + seconds - self.trimmed_starts[index])
+
+    def remap_segment(self, segment: dict) -> dict:
+        return {
+            **segment,
+            "start": self.to_original(segment["start"]),
+            "end": self.to_original(segment["end"], end=True),
+            "words": [
+                {
+                    **word,
+                    "start": self.to_original(word["start"]),
+                    "end": self.to_original(word["end"], end=True),
+                }
+                for word in segment.get("words", [])
+            ],
+        }
+
+
+def find_silences(audio: np.ndarray, frame_length: int = CONFIG.VAD_FRAME_SAMPLES) -> np.ndarray:
+    # (start, end) frames of every silent run of at least SILENCE_MIN_SECONDS.
+    # Silent is quieter than SILENCE_THRESHOLD_DB below the loud frames of the recording
+    energy = frame_energy(audio, frame_length)
+    if not energy.shape[0]:
+        return np.empty((0, 2), dtype=np.int64)
+
+    reference = np.percentile(energy, 95)
+    threshold = max(reference * 10 ** (CONFIG.SILENCE_THRESHOLD_DB / 20), CONFIG.SILENCE_FLOOR_RMS)
+    silent = (energy < threshold).astype(np.int8)
+
+    # +1 where a silent run starts, -1 one frame after it ends
+    edges = np.diff(np.concatenate(([0], silent, [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    min_frames = int(CONFIG.SILENCE_MIN_SECONDS * CONFIG.SAMPLE_RATE / frame_length)
+    long_runs = ends - starts >= min_frames
+    return np.column_stack((starts[long_runs], ends[long_runs]))
+
+
+def trim_silences(audio: np.ndarray) -> tuple[np.ndarray, TimeMap]:
+    silences = find_silences(audio) * CONFIG.VAD_FRAME_SAMPLES
+    if not silences.shape[0]:
+        return audio, TimeMap.identity()
+
+    # some silence is kept at both sides of every cut, so words are not clipped
+    pad = int(CONFIG.SILENCE_PAD_SECONDS * CONFIG.SAMPLE_RATE)
+    keep_starts = np.concatenate(([0], silences[:, 1] - pad))
+    keep_ends = np.concatenate((silences[:, 0] + pad, [audio.shape[0]]))
+    keep_starts, keep_ends = keep_starts.clip(0, audio.shape[0]), keep_ends.clip(0, audio.shape[0])
+
+    lengths = keep_ends - keep_starts
+    trimmed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    trimmed = np.concatenate([audio[start:end] for start, end in zip(keep_starts, keep_ends)])
+    return trimmed, TimeMap(
+        trimmed_starts / CONFIG.SAMPLE_RATE, keep_starts / CONFIG.SAMPLE_RATE
+    )
+
+
+def normalize_loudness(audio: np.ndarray) -> np.ndarray:
+    # RMS to LOUDNESS_TARGET_DB (dBFS), without clipping the peaks or amplifying too much
+    if not audio.shape[0]:
+        return audio
+    rms = np.sqrt(np.dot(audio, audio) / audio.shape[0])
+    peak = np.abs(audio).max()
+    if rms <= 0 or peak <= 0:
+        return audio
+
+    gain = min(
+        10 ** (CONFIG.LOUDNESS_TARGET_DB / 20) / rms,
+        10 ** (CONFIG.LOUDNESS_MAX_GAIN_DB / 20),
+        CONFIG.PEAK_LIMIT / peak,
+    )
+    if not audio.flags.writeable:
+        return (audio * gain).astype(np.float32)
+    audio *= np.float32(gain)
+    return audio
+
+
+def preprocess_audio(audio: np.ndarray) -> tuple[np.ndarray, TimeMap]:
+    # Returns the audio to transcribe and the map back to the original timeline
+    audio, time_map = trim_silences(audio)
+    return normalize_loudness(audio), time_map
@@ -0,0 +1,82 @@
+"""
+Media probing with ffprobe: duration, codecs, sample rate and the streams of a file,
+read from the container headers without decoding anything.
+
+This module has no local imports, so it can be imported both by the backend
+subprocess (`import probe`) and by the GUI process (`import backend.probe`).
+"""
+import json
+import subprocess
+from typing import Optional
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(file_path: str) -> dict:
+    # {"format", "duration", "video": bool, "audio": {"codec", "sample_rate", "channels",
+    # "stream"} or None}. Raises ValueError if it's not a media file, and FileNotFoundError
+    # if ffprobe is not installed
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-print_format",
+        "json",
+        "-show_format",
+        "-show_streams",
+        file_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ValueError(f"Not a media file: {result.stderr.strip() or file_path}")
+
+    data = json.loads(result.stdout or "{}")
+    streams = data.get("streams", [])
+    container = data.get("format", {})
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+    # cover art of audio files is a video stream too
+    video = any(
+        stream.get("codec_type") == "video"
+        and not stream.get("disposition", {}).get("attached_pic")
+        for stream in streams
+    )
+
+    info = {
+        "format": container.get("format_name"),
+        "duration": _to_float(container.get("duration")),
+        "video": video,
+        "audio": None,
+    }
+    if audio is not None:
+        info["audio"] = {
+            "codec": audio.get("codec_name"),
+            "sample_rate": int(audio.get("sample_rate") or 0),
+            "channels": audio.get("channels") or 0,
+            "stream": audio["index"],
+        }
+        if info["duration"] is None:
+            info["duration"] = _to_float(audio.get("duration"))
+    return info
+
+
+def media_type(info: dict) -> Optional[str]:
+    # "video", "audio" or None when there is nothing to transcribe
+    if info["audio"] is None:
+        return None
+    return "video" if info["video"] else "audio"
+
+
+def is_plain_wav(info: dict, sample_rate: int) -> bool:
+    # 16 bit PCM WAV at the sample rate Whisper uses, it can be read without ffmpeg
+    audio = info["audio"]
+    return (
+        audio is not None
+        and info["format"] == "wav"
+        and audio["codec"] == "pcm_s16le"
+        and audio["sample_rate"] == sample_rate
+    )
@@ -0,0 +1,99 @@
+# Locals
+import time
+
+# Backend
+import backend.config as CONFIG
+
+
+class ProgressTracker:
+    """
+    Progress of one job: decoded audio seconds against the total duration.
+
+    Decoded audio is kept as merged (start, end) intervals, so chunks finishing out of
+    order (parallel transcription) are counted right. The ETA uses an exponential moving
+    average of the decoding speed, and should_update() limits how often the GUI is told.
+    """
+
+    def __init__(
+        self,
+        duration: float = 0,
+        smoothing: float = CONFIG.ETA_SMOOTHING,
+        updates_per_second: float = CONFIG.PROGRESS_UPDATES_PER_SECOND,
+    ):
+        self.duration = duration
+        self.smoothing = smoothing
+        self.min_interval = 1 / updates_per_second
+        self.intervals: list[list[float]] = []
+        self.resumed = 0.0
+        self.started_at = time.monotonic()
+        self.last_sample = (self.started_at, 0.0)
+        # audio seconds decoded per wall second
+        self.rate: float | None = None
+        self.last_update = 0.0
+
+    def start(self, duration: float, resumed: float = 0) -> None:
+        # Called when the duration is known, the decoding starts then.
+        # resumed: seconds decoded before (resumed job), they don't count for the speed
+        self.duration = duration
+        self.intervals = [[0.0, resumed]] if resumed else []
+        self.resumed = resumed
+        self.started_at = time.monotonic()
+        self.last_sample = (self.started_at, resumed)
+        self.rate = None
+
+    def add(self, end: float, start: float = 0) -> None:
+        # Marks [start, end] as decoded
+        merged = [start, end]
+        kept = []
+        for interval in self.intervals:
+            if interval[1] < merged[0] or interval[0] > merged[1]:
+                kept.append(interval)
+            else:
+                merged = [min(merged[0], interval[0]), max(merged[1], interval[1])]
+        kept.append(merged)
+        self.intervals = sorted(kept)
+        self._sample()
+
+    def _sample(self) -> None:
+        now = time.monotonic()
+        last_time, last_decoded = self.last_sample
+        decoded = self.decoded
+        if now - last_time < CONFIG.ETA_MIN_SAMPLE_SECONDS or decoded <= last_decoded:
+            return
+
+        speed = (decoded - last_decoded) / (now - last_time)
+        if self.rate is None:
+            self.rate = speed
+        else:
+            self.rate = self.smoothing * speed + (1 - self.smoothing) * self.rate
+        self.last_sample = (now, decoded)
+
+    @property
+    def decoded(self) -> float:
+        total = sum(end - start for start, end in self.intervals)
+        return min(total, self.duration) if self.duration else total
+
+    def percent(self) -> int:
+        if not self.duration:
+            return 0
+        return min(100, int(self.decoded / self.duration * 100))
+
+    def rtf(self) -> float | None:
+        # wall time / audio time, since the decoding started
+        decoded = self.decoded - self.resumed
+        if decoded <= 0:
+            return None
+        return (time.monotonic() - self.started_at) / decoded
+
+    def eta(self) -> float | None:
+        # seconds left, None until there is a speed measure
+        if not self.duration or not self.rate:
+            return None
+        return max(0.0, (self.duration - self.decoded) / self.rate)
+
+    def should_update(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now - self.last_update < self.min_interval:
+            return False
+        self.last_update = now
+        return True
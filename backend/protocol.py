@@ -0,0 +1,121 @@
+"""
+Messages from the backend worker to the wrapper: one JSON object per line,
+{"event": <one of the types below>, ...fields}.
+
+This module has no local imports, so it can be imported both by the backend
+subprocess (`import protocol`) and by the GUI process (`import backend.protocol`).
+"""
+import json
+import re
+import sys
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Event types and their fields
+DURATION = "duration"  # seconds: float
+INFO = "info"  # message: str
+MODEL = "model"  # name, device, precision, load_seconds, weights_mb, rss_mb, cached
+LANGUAGE = "language"  # language: str | None (None while detecting)
+# language identification jobs add code, confidence, windows and top: [[code, probability]]
+# words is empty in the segments sent while transcribing (see WhisperOutput), the
+# segments of TRANSCRIPT have them
+SEGMENT = "segment"  # start: float, end: float, text: str, words: list[dict]
+PARTIAL = "partial"  # same as SEGMENT, it can still change (live transcription)
+PROGRESS = "progress"  # seconds: float, audio decoded up to there (from start: float, 0 default)
+CHECKPOINT = "checkpoint"  # seconds: float, every segment before it was sent
+SPAN = "span"  # name, seconds, audio_seconds, rtf, rss_mb, peak_rss_mb
+TRANSCRIPT = "transcript"  # segments: list[dict], language: str | None
+# batch jobs: messages about one of the clips have its index as "clip", and every clip
+# ends with this message (error: str | None)
+CLIP = "clip"
+DONE = "done"  # id: int
+FAILED = "failed"  # id: int, error: str
+
+# Where messages are written. The worker points it to the real stdout and sends
+# everything else that is printed to stderr
+OUTPUT = sys.stdout
+
+# fields added to every message, see tagged()
+TAGS: dict = {}
+
+
+def send(event: str, **fields) -> None:
+    OUTPUT.write(json.dumps({"event": event, **TAGS, **fields}, ensure_ascii=False) + "\n")
+    OUTPUT.flush()
+
+
+@contextmanager
+def tagged(**fields):
+    # Messages sent inside the block carry these fields too (e.g. the clip of a batch job)
+    previous = dict(TAGS)
+    TAGS.update(fields)
+    try:
+        yield
+    finally:
+        TAGS.clear()
+        TAGS.update(previous)
+
+
+def decode(line: bytes | str) -> Optional[dict]:
+    # None if the line is not a message
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+
+    if not isinstance(message, dict) or "event" not in message:
+        return None
+    return message
+
+
+def to_seconds(timestamp: str) -> float:
+    # "01:02:03.500" or "02:03.500" (whisper drops the hours when they are 0)
+    seconds = 0.0
+    for part in timestamp.split(":"):
+        seconds = 60 * seconds + float(part)
+    return seconds
+
+
+SEGMENT_LINE = re.compile(r"^\[([\d:.]+) --> ([\d:.]+)\]\s?(.*)$")
+
+
+class WhisperOutput:
+    """
+    File-like object for whisper's verbose output (stdout is redirected to it while
+    transcribing), the lines it prints are sent as messages.
+    The printed segments have no word timestamps, so the SEGMENT messages sent from here
+    have "words": []. Word timestamps only come with the TRANSCRIPT message at the end
+    of the job: the segments kept from a cancelled job (and from the journal when it's
+    resumed) have none.
+    """
+
+    def __init__(self, remap: Optional[Callable[[float, bool], float]] = None):
+        # remap(seconds, end) moves whisper's times to the original media (see preprocess.py)
+        self.pending = ""
+        self.remap = remap or (lambda seconds, end=False: seconds)
+
+    def write(self, text: str) -> int:
+        self.pending += text
+        *lines, self.pending = self.pending.split("\n")
+        for line in lines:
+            self.handle_line(line.strip())
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def handle_line(self, line: str) -> None:
+        match = SEGMENT_LINE.match(line)
+        if match:
+            start = self.remap(to_seconds(match.group(1)))
+            end = self.remap(to_seconds(match.group(2)), True)
+            send(SEGMENT, start=start, end=end, text=match.group(3), words=[])
+            send(PROGRESS, seconds=end)
+            # whisper goes on from the end of its last segment
+            send(CHECKPOINT, seconds=end)
+        elif line.startswith("Detecting language"):
+            send(LANGUAGE, language=None)
+        elif line.startswith("Detected language:"):
+            send(LANGUAGE, language=line.split(":", 1)[1].strip())
+        elif line:
+            print(line, file=sys.stderr)
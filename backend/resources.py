@@ -0,0 +1,53 @@
+# Memory usage of the current process. No local imports, so it can be used
+# by the backend subprocess and by the GUI process.
+import resource
+import sys
+
+
+def _status_mb(field: str) -> float | None:
+    # Linux only: VmRSS (current) and VmHWM (peak) in /proc/self/status, in kB
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    peak = _status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss is in kB on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def rss_mb() -> float:
+    current = _status_mb("VmRSS")
+    return current if current is not None else peak_rss_mb()
+
+
+def available_mb() -> float | None:
+    # Linux only: memory that can be used without swapping (MemAvailable in /proc/meminfo)
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    # Linux only: the peak (VmHWM) goes back to the current RSS, so it can be measured
+    # per job in a long-lived process. False if it's not supported
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,193 @@
+"""
+Live transcription of audio that is still being produced.
+
+Sources give audio in fixed windows (read(seconds) -> array, None at the end):
+- WavFollower: a WAV file that is still being written, or a WAV named pipe
+- FfmpegSource: anything ffmpeg can open, e.g. a local device ("-f pulse -i default")
+
+Every step the new window is appended to a buffer and the buffer is transcribed again.
+Segments ending before the last `overlap` seconds are final (emitted once, and removed
+from the buffer), the rest are partial and may change on the next step.
+The latency is bounded by the step plus the time it takes to transcribe the buffer,
+which is kept under `max_buffer` seconds: past it, the segments that started in the
+oldest audio are final even if whisper hasn't ended them.
+"""
+import shlex
+import struct
+import subprocess
+import tempfile
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import whisper
+
+# # this import is relative, because streaming.py is used by the backend subprocess
+import config as CONFIG
+from audio import check_ffmpeg, resample, to_mono_float
+from chunking import shift_segment
+
+
+class WavFollower:
+    def __init__(self, path: str, idle_timeout: float = CONFIG.STREAM_IDLE_TIMEOUT):
+        self.file = open(path, "rb")
+        self.idle_timeout = idle_timeout
+        self.channels, self.sample_rate = self._read_header()
+
+    def _read_exact(self, size: int) -> bytes:
+        # Waits for the writer, until `idle_timeout` seconds go by without new data
+        data = b""
+        last_data = time.monotonic()
+        while len(data) < size:
+            chunk = self.file.read(size - len(data))
+            if chunk:
+                data += chunk
+                last_data = time.monotonic()
+            elif time.monotonic() - last_data > self.idle_timeout:
+                break
+            else:
+                time.sleep(CONFIG.STREAM_POLL_SECONDS)
+        return data
+
+    def _read_header(self) -> tuple[int, int]:
+        riff = self._read_exact(12)
+        if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError("Stream source is not a WAV file")
+
+        channels, sample_rate = 1, CONFIG.SAMPLE_RATE
+        while True:
+            header = self._read_exact(8)
+            if len(header) < 8:
+                raise ValueError("WAV stream has no data chunk")
+            chunk_id, chunk_size = header[:4], struct.unpack("<I", header[4:])[0]
+            if chunk_id == b"data":
+                return channels, sample_rate
+
+            chunk = self._read_exact(chunk_size + chunk_size % 2)
+            if chunk_id == b"fmt ":
+                audio_format, channels, sample_rate = struct.unpack("<HHI", chunk[:8])
+                bits = struct.unpack("<H", chunk[14:16])[0]
+                if audio_format != 1 or bits != 16:
+                    raise ValueError("Only 16 bit PCM WAV streams are supported")
+
+    def read(self, seconds: float) -> Optional[np.ndarray]:
+        frame_size = 2 * self.channels
+        data = self._read_exact(int(seconds * self.sample_rate) * frame_size)
+        data = data[: len(data) - len(data) % frame_size]
+        if not data:
+            return None
+        audio = to_mono_float(np.frombuffer(data, dtype="<i2"), self.channels)
+        return resample(audio, self.sample_rate)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class FfmpegSource:
+    def __init__(self, input_args: str):
+        cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", *shlex.split(input_args)]
+        cmd += ["-vn", "-f", "f32le", "-ac", "1", "-ar", str(CONFIG.SAMPLE_RATE), "-"]
+        self.errors = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self.errors)
+
+    @classmethod
+    def for_file(
+        cls, file_path: str, start: float = 0, stream: Optional[int] = None
+    ) -> "FfmpegSource":
+        # A media file read in windows from start (seconds), see windowed.py
+        args = ["-ss", str(start)] if start else []
+        args += ["-i", file_path]
+        if stream is not None:
+            args += ["-map", f"0:{stream}"]
+        return cls(shlex.join(args))
+
+    def read(self, seconds: float) -> Optional[np.ndarray]:
+        # Read straight into the array, so a long window is not copied chunk by chunk
+        audio = np.empty(int(seconds * CONFIG.SAMPLE_RATE), dtype=np.float32)
+        view = memoryview(audio).cast("B")
+        filled = 0
+        while filled < len(view):
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                # end of the output: a corrupt file or a failed decode is not the end
+                check_ffmpeg(self.process, self.errors)
+                break
+            filled += count
+        if filled < 4:
+            return None
+        return audio[: filled // 4]
+
+    def close(self) -> None:
+        # killed only if it's still running (stopped before the end), its exit status
+        # was checked otherwise
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.errors.close()
+
+
+def open_source(source: str, source_type: str):
+    if source_type == "ffmpeg":
+        return FfmpegSource(source)
+    return WavFollower(source)
+
+
+def transcribe_stream(
+    source,
+    model: whisper.Whisper,
+    decode_options: dict,
+    on_partial: Callable,
+    on_final: Callable,
+    step: float = CONFIG.STREAM_STEP_SECONDS,
+    overlap: float = CONFIG.STREAM_OVERLAP_SECONDS,
+    max_buffer: float = CONFIG.STREAM_MAX_BUFFER_SECONDS,
+) -> None:
+    # on_partial(segments) with the current guesses, on_final(segments) with final segments
+    decode_options = {**decode_options, "condition_on_previous_text": False}
+    buffer = np.zeros(0, dtype=np.float32)
+    # seconds from the start of the stream to the start of the buffer
+    offset = 0.0
+
+    while True:
+        window = source.read(step)
+        finished = window is None
+        if not finished:
+            buffer = np.concatenate((buffer, window))
+        if not buffer.shape[0]:
+            return
+
+        result = model.transcribe(buffer, verbose=None, word_timestamps=True, **decode_options)
+        # keep the detected language, so it doesn't change between steps
+        decode_options["language"] = decode_options.get("language") or result["language"]
+        segments = [shift_segment(segment, offset) for segment in result["segments"]]
+
+        buffer_seconds = buffer.shape[0] / CONFIG.SAMPLE_RATE
+        if finished:
+            on_final(segments)
+            return
+
+        commit_until = offset + buffer_seconds - overlap
+        final = [segment for segment in segments if segment["end"] <= commit_until]
+        partial = segments[len(final) :]
+
+        if final:
+            on_final(final)
+            cut = final[-1]["end"] - offset
+            buffer = buffer[int(cut * CONFIG.SAMPLE_RATE) :]
+            offset += cut
+        elif buffer_seconds >= max_buffer:
+            # no segment ends before the overlap: nothing said, or one long segment of
+            # continuous speech. The oldest audio is dropped, and the segments starting
+            # there are final first (their text would be lost with it)
+            cut = buffer_seconds - overlap
+            final = [segment for segment in segments if segment["start"] - offset < cut]
+            partial = segments[len(final) :]
+            if final:
+                on_final(final)
+                # after their end, so their text is not transcribed again
+                cut = min(final[-1]["end"] - offset, buffer_seconds)
+            buffer = buffer[int(cut * CONFIG.SAMPLE_RATE) :]
+            offset += cut
+
+        if partial:
+            on_partial(partial)
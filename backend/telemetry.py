@@ -0,0 +1,31 @@
+"""
+Timing spans of the backend stages (extraction, model load, language detection, decoding).
+Every span is sent as a "span" message with its wall time, the audio seconds it
+processed, the real-time factor and the memory of the process.
+"""
+import time
+from contextlib import contextmanager
+
+# # this import is relative, because telemetry.py is used by the backend subprocess
+import protocol
+from resources import peak_rss_mb, rss_mb
+
+
+@contextmanager
+def span(name: str, audio_seconds: float | None = None):
+    # The yielded dict can set "audio_seconds" when it's only known at the end
+    record = {"audio_seconds": audio_seconds}
+    start = time.perf_counter()
+    yield record
+    seconds = time.perf_counter() - start
+
+    audio_seconds = record["audio_seconds"]
+    protocol.send(
+        protocol.SPAN,
+        name=name,
+        seconds=round(seconds, 4),
+        audio_seconds=audio_seconds,
+        rtf=round(seconds / audio_seconds, 4) if audio_seconds else None,
+        rss_mb=round(rss_mb(), 1),
+        peak_rss_mb=round(peak_rss_mb(), 1),
+    )
@@ -1,13 +1,17 @@
 # Locals
 import backend.config as CONFIG
+from backend.probe import media_type, probe_media
 
 # Libraries
+import json
 import mimetypes
+import shutil
 
 mimetypes.init()
 
 
-def find_file_type(file_path) -> str:
+def guess_file_type(file_path) -> str:
+    # From the extension only
     mimestart = mimetypes.guess_type(file_path)[0]
 
     if mimestart is None:
@@ -17,10 +21,55 @@ def find_file_type(file_path) -> str:
     return mimestart
 
 
+def has_ffprobe() -> bool:
+    # ffprobe and ffmpeg come together, the backend needs both
+    return shutil.which("ffprobe") is not None
+
+
+def probe_file(file_path) -> tuple[str, dict | None]:
+    # (file type, probe_media() result). The type comes from the streams in the file, so
+    # a file with the wrong extension is still found, and a video without sound is
+    # "unknown". Needs ffprobe (see has_ffprobe)
+    try:
+        media = probe_media(file_path)
+    except ValueError:
+        return "unknown", None
+    return media_type(media) or "unknown", media
+
+
 def is_media_file(file_path) -> bool:
-    file_type = find_file_type(file_path)
+    # From the extension, cheap enough to scan folders. Files are probed when submitted
+    file_type = guess_file_type(file_path)
 
     if file_type not in CONFIG.ACCEPTED_FILE_TYPES:
         return False
 
     return True
+
+
+def read_model_stats() -> dict:
+    # Load measures written by the backend (see backend/models.py)
+    try:
+        with open(CONFIG.MODEL_STATS_FILE) as stats_file:
+            return json.load(stats_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def describe_models() -> list[tuple[str, str]]:
+    # (name, description) of every model, with the last measured load time and memory
+    stats_by_model: dict = {}
+    for stats in read_model_stats().values():
+        stats_by_model.setdefault(stats["name"], stats)
+
+    descriptions = []
+    for name, info in CONFIG.MODELS.items():
+        description = f"{info['parameters']} params, {info['memory']}, {info['speed']} speed"
+        stats = stats_by_model.get(name)
+        if stats:
+            description += (
+                f", loads in {stats['load_seconds']} s ({stats['device']}),"
+                f" {stats['weights_mb']} MB weights"
+            )
+        descriptions.append((name, description))
+    return descriptions
@@ -1,55 +1,321 @@
-import whisper
 import sys
+import wave
+from contextlib import redirect_stdout
 from typing import Optional, Literal
 
+import numpy as np
+
 # # this import is relative, because voice_backend.py is opened as subprocess
+import cache
 import config as CONFIG
+import protocol
+from audio import audio_duration, decode_audio, read_wav
+from batching import batch_size, transcribe_clips
+from chunking import default_workers, transcribe_chunks
+from language import detect_language
+from models import get_model, model_options, uses_fp16
+from preprocess import TimeMap, preprocess_audio
+from probe import is_plain_wav, probe_media
+from streaming import FfmpegSource, open_source, transcribe_stream
+from telemetry import span
+from windowed import transcribe_windows
 
 
-import moviepy.editor as mp
+def audio_length(audio: np.ndarray, offset: float = 0) -> float:
+    # offset: where the audio starts in the media (resumed jobs), the whole duration is sent
+    duration = offset + audio_duration(audio)
+    protocol.send(protocol.DURATION, seconds=duration)
+    return duration
 
 
-def audio_length(file_path: str = CONFIG.AUDIO_PATH):
-    duration = mp.AudioFileClip(file_path).duration
-    print(f"{CONFIG.DURATION_MSG}{duration}")
-    return duration
+def file_to_audio(file_path: str, media: Optional[dict] = None, start: float = 0) -> np.ndarray:
+    # Decodes the file (audio or video) in memory from start (seconds), see audio.py.
+    # media is the probe_media() result when the caller already has it
+    media = media or probe_media(file_path)
+    if media["audio"] is None:
+        raise ValueError(CONFIG.NO_AUDIO_MSG)
+
+    if media["video"]:
+        protocol.send(protocol.INFO, message=CONFIG.EXTRACTING_MSG)
+    with span("extraction") as record:
+        audio = None
+        if is_plain_wav(media, CONFIG.SAMPLE_RATE):
+            try:
+                audio = read_wav(file_path)[int(start * CONFIG.SAMPLE_RATE) :]
+            except wave.Error:
+                pass
+        if audio is None:
+            audio = decode_audio(file_path, start=start, stream=media["audio"]["stream"])
+        record["audio_seconds"] = audio_duration(audio)
+    return audio
+
+
+def send_segments(
+    segments: list[dict], event: str = protocol.SEGMENT, progress: bool = True
+) -> None:
+    for segment in segments:
+        protocol.send(event, **segment)
+    if segments and progress and event == protocol.SEGMENT:
+        protocol.send(protocol.PROGRESS, seconds=segments[-1]["end"])
+
+
+def send_chunk_segments(segments: list[dict]) -> None:
+    # chunking.py sends its own progress messages
+    send_segments(segments, progress=False)
+
+
+def send_transcript(segments: list[dict], language: Optional[str]) -> dict:
+    protocol.send(protocol.TRANSCRIPT, segments=segments, language=language)
+    return {"segments": segments, "language": language}
+
 
+def replay_transcript(duration: float, segments: list[dict], language: Optional[str]) -> dict:
+    # Sends a transcript that was already done (e.g. cached) as if it was transcribed now
+    protocol.send(protocol.DURATION, seconds=duration)
+    send_segments(segments)
+    return send_transcript(segments, language)
 
-def file_to_audio(file_path: str):
-    clip = mp.VideoFileClip(file_path)
-    clip.audio.write_audiofile(CONFIG.AUDIO_PATH)
+
+def send_partial(segments: list[dict]) -> None:
+    send_segments(segments, protocol.PARTIAL)
+
+
+def to_segments(result: dict) -> list[dict]:
+    # Only what we use of whisper's segments
+    return [
+        {
+            "start": segment["start"],
+            "end": segment["end"],
+            "text": segment["text"],
+            "words": segment.get("words", []),
+        }
+        for segment in result["segments"]
+    ]
 
 
 def transcribe_audio(
-    audio_path: str,
+    audio: str | np.ndarray,
+    language: Optional[str] = None,
+    task: Literal["transcribe", "translate"] = "transcribe",
+    options: Optional[dict] = None,
+    chunk_workers: int = CONFIG.CHUNK_WORKERS,
+    preprocess: bool = CONFIG.PREPROCESS_ENABLED,
+    offset: float = 0,
+) -> dict:
+    # options: model load options (see models.model_options). Loaded models are kept
+    # in memory, so the worker only loads each model once.
+    # offset: where the audio starts in the media, segment times are moved by it
+    options = options or model_options()
+    model = get_model(options)
+    duration = audio_duration(audio) if isinstance(audio, np.ndarray) else None
+
+    time_map = TimeMap.identity()
+    if preprocess and duration is not None:
+        with span("preprocess", duration):
+            audio, time_map = preprocess_audio(audio)
+        if time_map.removed_seconds:
+            protocol.send(
+                protocol.INFO, message=f"Skipping {time_map.removed_seconds:.0f} s of silence"
+            )
+    time_map = time_map.shifted(offset)
+
+    # done here (and not by whisper) to time it on its own
+    if language is None and duration is not None:
+        with span("language", min(audio_duration(audio), CONFIG.LANGUAGE_WINDOW_SECONDS)):
+            language = detect_language(model, audio)
+    decode_options: dict = {"language": language, "task": task, "fp16": uses_fp16(options)}
+
+    is_long = isinstance(audio, np.ndarray) and audio_duration(audio) > CONFIG.CHUNK_MIN_SECONDS
+    if is_long and not chunk_workers:
+        chunk_workers = default_workers(model)
+    # audio seconds of the original media, so the RTF shows what preprocessing saves
+    with span("decoding", duration):
+        if chunk_workers > 1 and is_long:
+            segments, language = transcribe_chunks(
+                audio,
+                model,
+                options,
+                decode_options,
+                chunk_workers,
+                send_chunk_segments,
+                time_map,
+            )
+        else:
+            # whisper's verbose output is turned into segment messages as it's printed
+            with redirect_stdout(protocol.WhisperOutput(time_map.to_original)):
+                result = model.transcribe(
+                    audio,
+                    verbose=True,
+                    word_timestamps=True,
+                    **decode_options,
+                )
+            segments = [time_map.remap_segment(segment) for segment in to_segments(result)]
+            language = result["language"]
+
+    return send_transcript(segments, language)
+
+
+def transcribe_windowed(
+    file_path: str,
+    media: Optional[dict] = None,
     language: Optional[str] = None,
     task: Literal["transcribe", "translate"] = "transcribe",
+    options: Optional[dict] = None,
+    preprocess: bool = CONFIG.PREPROCESS_ENABLED,
+    offset: float = 0,
+    memory_limit_mb: Optional[float] = None,
+    chunk_workers: int = CONFIG.CHUNK_WORKERS,
+) -> dict:
+    # Like file_to_audio + transcribe_audio, but the file is never fully in memory
+    # (see windowed.py). The duration comes from the probe.
+    # chunk_workers transcribe the chunks of every window in parallel
+    options = options or model_options()
+    model = get_model(options)
+    if not chunk_workers:
+        chunk_workers = default_workers(model)
+    media = media or probe_media(file_path)
+    if media["audio"] is None:
+        raise ValueError(CONFIG.NO_AUDIO_MSG)
+    duration = media["duration"] or 0
+    protocol.send(protocol.DURATION, seconds=duration)
+
+    decode_options: dict = {"language": language, "task": task, "fp16": uses_fp16(options)}
+    source = FfmpegSource.for_file(file_path, offset, media["audio"]["stream"])
+    try:
+        with span("decoding", duration - offset or None):
+            segments, language = transcribe_windows(
+                source,
+                model,
+                decode_options,
+                offset,
+                memory_limit_mb,
+                preprocess,
+                options,
+                chunk_workers,
+                send_chunk_segments,
+            )
+    finally:
+        source.close()
+
+    return send_transcript(segments, language)
+
+
+def load_clip(
+    clip: dict,
+    options: dict,
+    language: Optional[str],
+    task: str,
+    preprocess: bool,
+    use_cache: bool,
+) -> Optional[tuple]:
+    # (audio, duration, time map, cache key) of a clip of a batch job. None if it's done
+    # already: cached, or failed (its "clip" message is sent)
+    try:
+        key = None
+        if use_cache:
+            key = cache.cache_key(clip["path"], options, language, task, preprocess, batched=True)
+            # a transcript of the whole file is as good, and has word timestamps
+            full_key = cache.cache_key(clip["path"], options, language, task, preprocess)
+            cached = cache.load(full_key) or cache.load(key)
+            if cached is not None:
+                replay_transcript(cached["duration"], cached["segments"], cached["language"])
+                protocol.send(protocol.CLIP, error=None)
+                return None
+
+        audio = file_to_audio(clip["path"], clip.get("media"))
+        duration = audio_length(audio)
+        time_map = TimeMap.identity()
+        if preprocess:
+            audio, time_map = preprocess_audio(audio)
+    except Exception as error:
+        protocol.send(protocol.CLIP, error=str(error))
+        return None
+    return audio, duration, time_map, key
+
+
+def transcribe_batch(
+    clips: list[dict],
+    language: Optional[str] = None,
+    task: Literal["transcribe", "translate"] = "transcribe",
+    options: Optional[dict] = None,
+    preprocess: bool = CONFIG.PREPROCESS_ENABLED,
+    use_cache: bool = CONFIG.CACHE_ENABLED,
+    memory_limit_mb: Optional[float] = None,
+) -> None:
+    # Short clips ({"path", "media"}) transcribed a batch at a time (see batching.py).
+    # Messages about a clip have its index as "clip", and every clip ends with a
+    # "clip" message. A clip that fails doesn't stop the others
+    options = options or model_options()
+    model = get_model(options)
+    decode_options: dict = {"language": language, "task": task, "fp16": uses_fp16(options)}
+    size = batch_size(model, memory_limit_mb)
+    protocol.send(protocol.INFO, message=f"Transcribing {len(clips)} clips, {size} at a time")
+
+    for first in range(0, len(clips), size):
+        loaded = []
+        for index in range(first, min(first + size, len(clips))):
+            with protocol.tagged(clip=index):
+                clip = load_clip(clips[index], options, language, task, preprocess, use_cache)
+            if clip is not None:
+                loaded.append((index, *clip))
+        if not loaded:
+            continue
+
+        audios = [audio for _, audio, _, _, _ in loaded]
+        with span("decoding", sum(duration for _, _, duration, _, _ in loaded)):
+            results = transcribe_clips(model, audios, decode_options)
+
+        for (index, audio, duration, time_map, key), result in zip(loaded, results):
+            with protocol.tagged(clip=index):
+                try:
+                    if result is None:
+                        # whisper's temperature fallback, for this clip only
+                        result = model.transcribe(audio, verbose=None, **decode_options)
+                        result["segments"] = to_segments(result)
+                    segments = [time_map.remap_segment(segment) for segment in result["segments"]]
+                    send_segments(segments)
+                    send_transcript(segments, result["language"])
+                    if key is not None:
+                        cache.store(key, duration, result["language"], segments)
+                except Exception as error:
+                    protocol.send(protocol.CLIP, error=str(error))
+                else:
+                    protocol.send(protocol.CLIP, error=None)
+
+
+def stream_audio(
+    source: str,
+    source_type: str = "wav",
+    language: Optional[str] = None,
+    task: Literal["transcribe", "translate"] = "transcribe",
+    options: Optional[dict] = None,
+    step: float = CONFIG.STREAM_STEP_SECONDS,
 ):
-    model: whisper.Whisper = whisper.load_model("tiny")
-    decode_options: dict = {"language": language, "task": task}
-    print(decode_options)
-    model.transcribe(
-        audio_path,
-        verbose=True,
-        word_timestamps=True,
-        **decode_options,
-    )
+    options = options or model_options()
+    model = get_model(options)
+    decode_options: dict = {"language": language, "task": task, "fp16": uses_fp16(options)}
+
+    stream = open_source(source, source_type)
+    try:
+        transcribe_stream(stream, model, decode_options, send_partial, send_segments, step=step)
+    finally:
+        stream.close()
+
+
+def check_task(task: str) -> None:
+    if not (task == "translate" or task == "transcribe"):
+        raise AssertionError(f"Task must be 'transcribe' or 'translate', got {task}")
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 5:
         raise AssertionError("Expected 4 arguments: path to file, filetype, language, task")
     PATH = sys.argv[1]
-    FILETYPE = sys.argv[2]
+    # the file type is found by probing the file, the argument is kept for compatibility
     LANGUAGE = sys.argv[3] if len(sys.argv[3]) else None
     TASK = sys.argv[4]
 
-    if FILETYPE == "video":
-        file_to_audio(PATH)
-        PATH = CONFIG.AUDIO_PATH
-
-    audio_length(PATH)
-    print("TASK:", TASK, type(TASK), TASK == "translate")
-    if not (TASK == "translate" or TASK == "transcribe"):
-        raise AssertionError(f"Task must be 'transcribe' or 'translate', got {TASK}")
-    transcribe_audio(PATH, LANGUAGE, TASK)
+    check_task(TASK)
+    AUDIO = file_to_audio(PATH)
+    audio_length(AUDIO)
+    transcribe_audio(AUDIO, LANGUAGE, TASK)
@@ -1,16 +1,25 @@
 # Locals
+import asyncio
+import json
 import os
-import re
-import subprocess
-from threading import Thread
+import pathlib
+import shutil
+import signal
+import tempfile
+import time
+from concurrent.futures import Future
 from typing import Callable, Literal
 import sys
 
 # Backend
 import backend.config as CONFIG
-from backend.utils import find_file_type, is_media_file
-
-CLIP_DURATION: float = 0
+import backend.protocol as protocol
+from backend.event_loop import AsyncWriter, EventLoopThread
+from backend.export import export_transcript, format_timestamp
+from backend.journal import Journal, prune_journals
+from backend.logs import log_metrics, logger, setup_logging
+from backend.jobs import FINISHED_STATES, Job, JobQueue, JobState
+from backend.utils import has_ffprobe, probe_file
 
 VERBOSE = True
 
@@ -34,136 +43,601 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
-def clip_duration_setter(value: float):
-    global CLIP_DURATION
-    CLIP_DURATION = value
-    return ""
+def backend_script_path(script: str) -> str:
+    # See the note at is_build()
+    return resource_path(script) if is_build() else os.path.join("backend", script)
 
 
-def process_startswith(starter: str, parser: Callable, signal):
-    def func(msg):
-        if not msg.strip().startswith(starter):
-            return
+class BackendWorker:
+    """
+    Handle to the long-lived worker process (backend/worker.py).
+    The process is started on the first job and then reused, so the Whisper
+    model is only loaded once. Jobs are sent one at a time.
+    Its pipes are asyncio streams: start(), stop() and submit() are coroutines of the
+    event loop (see backend/event_loop.py), kill() can be called from any thread.
+    """
 
-        parsed_msg = parser(msg)
-        signal.emit(parsed_msg)
+    def __init__(self):
+        self.process: asyncio.subprocess.Process | None = None
+        self.lock = asyncio.Lock()
+        self.job_counter = 0
 
-    return func
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
 
+    async def start(self) -> None:
+        if self.is_alive():
+            return
 
-def progress(string) -> int:
-    match = re.match(r"\[[^\]]*]", string)
-    if not match:
-        return 0
+        cmd = ["python", "-u", backend_script_path("worker.py")]
+        # own process group, so kill() also stops its children (ffmpeg, chunk pool)
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            start_new_session=True,
+            limit=CONFIG.WORKER_LINE_LIMIT,
+        )
 
-    string = match.group(0)
-    # strings look like this: [00:03.500 --> 00:04.500]
-    # we want only the second time (00:04.500)
-    # and convert it to seconds (60 * minutes + seconds, ignoring the ms)
-    remove = ("[", "]", "-->")
-    for char in remove:
-        string = string.replace(char, "")
-    string.strip()
-    string = string.split("  ")[1]
+    async def stop(self) -> None:
+        if not self.is_alive():
+            return
 
-    def format_to_seconds(time):
-        hours, seconds = time.split(":")
-        seconds = seconds.split(".")[0]
-        return 60 * int(hours) + int(seconds)
+        # closing stdin makes the worker leave its job loop
+        self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), CONFIG.WORKER_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.kill()
+            await self.process.wait()
+
+    def kill(self) -> None:
+        # Stops the worker right away, a running job ends with an error.
+        # The next job starts a new worker. Only sends the signal, submit() sees the
+        # end of the output and waits for the process
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
 
-    return format_to_seconds(string)
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                # TerminateProcess on Windows
+                os.kill(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    async def submit(
+        self, job: dict, on_message: Callable, is_cancelled: Callable | None = None
+    ) -> tuple[bool, str]:
+        # Sends a job and calls on_message for each of its messages (see backend/protocol.py).
+        # Returns (succeeded, error message)
+        async with self.lock:
+            await self.start()
+            # cancelled while waiting for the worker (e.g. a warm-up): kill() had nothing
+            # to stop yet, or stopped the warm-up instead
+            if is_cancelled is not None and is_cancelled():
+                return False, "Cancelled"
+            self.job_counter += 1
+            job = {**job, "id": self.job_counter}
+
+            self.process.stdin.write((json.dumps(job) + "\n").encode("utf-8"))
+            try:
+                await self.process.stdin.drain()
+            except ConnectionError:
+                # the worker is gone, its exit code is reported below
+                pass
+
+            while line := await self.process.stdout.readline():
+                logger.debug(line.decode("utf-8").rstrip())
+
+                message = protocol.decode(line)
+                if message is None:
+                    continue
+
+                event = message["event"]
+                if event == protocol.DONE and message["id"] == job["id"]:
+                    return True, ""
+                if event == protocol.FAILED and message["id"] == job["id"]:
+                    return False, message["error"]
+                on_message(message)
+
+            exit_code = await self.process.wait()
+            return False, f"Backend worker exited unexpectedly (exit code {exit_code})"
 
 
 class VoiceProcessor:
-    def __init__(self, signals):
+    def __init__(self, signals, concurrency: int = CONFIG.MAX_CONCURRENT_JOBS):
+        # signals: frontend.ui.Signals, or anything with the same attributes (see cli.py)
         self.signals = signals
-
-        self.processors = (
-            process_startswith(
-                "MoviePy - Writing audio in",
-                lambda _: "Extracting audio...",
-                self.signals.process_info,
-            ),
-            process_startswith(
-                "Detecting language:",
-                lambda _: "Detecting language...",
-                self.signals.process_info,
-            ),
-            process_startswith(
-                "Detected language:",
-                lambda x: x.lower().capitalize(),
-                self.signals.process_info,
-            ),
-            process_startswith(
-                CONFIG.DURATION_MSG,
-                lambda x: clip_duration_setter(float(x.split(":")[1].strip())),
-                self.signals.process_info,
-            ),
+        setup_logging(VERBOSE)
+        # workers, jobs and their files are supervised from this one thread
+        self.loop = EventLoopThread()
+        self.queue = JobQueue(
+            self.run,
+            self.handle_state,
+            self.handle_idle,
+            self.stop_job,
+            self.loop,
+            concurrency=concurrency,
+        )
+        # one backend worker per queue slot
+        self.workers = [BackendWorker() for _ in range(self.queue.concurrency)]
+        self.output_dir = tempfile.mkdtemp(prefix=CONFIG.OUTPUT_DIR_PREFIX)
+        prune_journals()
+
+        # event type -> handler(job, output_file, message)
+        self.handlers = {
+            protocol.DURATION: self.on_duration,
+            protocol.INFO: self.on_info,
+            protocol.MODEL: self.on_model,
+            protocol.LANGUAGE: self.on_language,
+            protocol.SEGMENT: self.on_segment,
+            protocol.PARTIAL: self.on_partial,
+            protocol.PROGRESS: self.on_progress,
+            protocol.CHECKPOINT: self.on_checkpoint,
+            protocol.SPAN: self.on_span,
+            protocol.TRANSCRIPT: self.on_transcript,
+        }
+
+    def warm_up(self, model: str = CONFIG.DEFAULT_MODEL, **options) -> None:
+        # Starts the workers in the background and loads the model in them, so the first
+        # job doesn't wait for the backend imports and the model load.
+        # A job submitted meanwhile waits for the warm-up of its worker to finish
+        job = {"mode": "warmup", "task": "transcribe", "model": model, **options}
+        for worker in self.workers:
+            self.loop.run(self.warm_up_worker(worker, job))
+
+    async def warm_up_worker(self, worker: BackendWorker, job: dict) -> None:
+        spans = {}
+
+        def on_message(message):
+            if message["event"] == protocol.SPAN:
+                spans[f"{message['name']}_seconds"] = message["seconds"]
+
+        started_at = time.monotonic()
+        succeeded, error = await worker.submit(job, on_message)
+        log_metrics(
+            "warmup",
+            model=job["model"],
+            seconds=round(time.monotonic() - started_at, 3),
+            error=None if succeeded else error,
+            **spans,
         )
 
     def process_file(
         self, file_path: str, language: str | None, task: Literal["transcribe", "translate"]
     ) -> None:
-        file_type = find_file_type(file_path)
+        self.process_batch([file_path], language, task)
 
-        if not is_media_file(file_path):
-            self.signals.process_error.emit(
-                f"File not supported (use {', '.join(CONFIG.ACCEPTED_FILE_TYPES)} files)"
-            )
-            return
+    def process_batch(
+        self,
+        file_paths: list[str],
+        language: str | None,
+        task: Literal["transcribe", "translate"],
+        model: str = CONFIG.DEFAULT_MODEL,
+        **options,
+    ) -> Future:
+        # Probing and submitting run on the event loop, so the caller (the GUI thread)
+        # doesn't wait for ffprobe. The future has the jobs
+        return self.loop.run(self.submit_files(file_paths, language, task, model, options))
+
+    async def submit_files(
+        self,
+        file_paths: list[str],
+        language: str | None,
+        task: Literal["transcribe", "translate"],
+        model: str,
+        options: dict,
+    ) -> list[Job]:
+        if not has_ffprobe():
+            self.signals.process_error.emit(CONFIG.NO_FFPROBE_MSG)
+            return []
+
+        # probed once here (ffprobe runs in parallel), the worker gets the result with the job
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(None, probe_file, path) for path in file_paths)
+        )
+        probes = dict(zip(file_paths, results))
+        supported = [
+            path for path in file_paths if probes[path][0] in CONFIG.ACCEPTED_FILE_TYPES
+        ]
+        for path in file_paths:
+            if path not in supported:
+                self.signals.process_error.emit(
+                    f"File not supported: {path} (use {', '.join(CONFIG.ACCEPTED_FILE_TYPES)}"
+                    " files with sound)"
+                )
+        if not supported:
+            return []
+
+        if not self.queue.batch:
+            self.signals.process_started.emit()
+
+        jobs = []
+        for path in supported:
+            file_type, media = probes[path]
+            job_options = {**options, "media": media} if media else options
+            jobs.append(Job(path, file_type, language, task, model, job_options))
+
+        # short clips are transcribed together, a single one goes alone (word timestamps)
+        clips = [job for job in jobs if self.is_clip(job)]
+        if len(clips) < 2:
+            clips = []
+        for first in range(0, len(clips), CONFIG.BATCH_GROUP_SIZE):
+            self.submit_clips(clips[first : first + CONFIG.BATCH_GROUP_SIZE])
+        for job in jobs:
+            if job.group is None:
+                self.queue.submit(job)
+        return jobs
+
+    def is_clip(self, job: Job) -> bool:
+        # Short enough for one whisper window (see backend/batching.py)
+        duration = (job.options.get("media") or {}).get("duration")
+        return (
+            job.options.get("batch", CONFIG.BATCH_ENABLED)
+            and not job.options.get("mode")
+            and duration is not None
+            and duration <= CONFIG.BATCH_MAX_SECONDS
+        )
 
-        transcription_task = Thread(
-            target=self.run, daemon=True, args=(file_path, file_type, language, task)
+    def submit_clips(self, clips: list[Job]) -> Job:
+        # One batch job for all the clips, the worker transcribes them together
+        first = clips[0]
+        options = {key: value for key, value in first.options.items() if key != "media"}
+        group = Job(
+            f"{len(clips)} clips",
+            "batch",
+            first.language,
+            first.task,
+            first.model,
+            {**options, "mode": "batch"},
         )
-        transcription_task.start()
+        group.clips = clips
+        for clip in clips:
+            clip.group = group
+        return self.queue.submit(group)
 
-    def run(
+    def process_stream(
         self,
-        file_path: str,
-        file_type: str,
+        source: str,
         language: str | None,
         task: Literal["transcribe", "translate"],
-    ) -> None:
-        # See the note at is_build()
-        voice_backend_path = (
-            resource_path("voice_backend.py")
-            if is_build()
-            else os.path.join("backend", "voice_backend.py")
-        )
-        cmd = [
-            "python",
-            "-u",
-            voice_backend_path,
-            file_path,
-            file_type,
-            language,
-            task,
+        model: str = CONFIG.DEFAULT_MODEL,
+        source_type: Literal["wav", "ffmpeg"] = "wav",
+        **options,
+    ) -> Job:
+        # Live transcription: partial and final segments come through the
+        # segment_partial and segment_final signals while the source is being read
+        if not self.queue.batch:
+            self.signals.process_started.emit()
+
+        options = {"mode": "stream", "source_type": source_type, **options}
+        return self.queue.submit(Job(source, "stream", language, task, model, options))
+
+    def detect_languages(
+        self,
+        file_paths: list[str],
+        model: str = CONFIG.DEFAULT_MODEL,
+        windows: int = CONFIG.LANGUAGE_WINDOWS,
+        **options,
+    ) -> Future:
+        # Language identification only, much cheaper than transcribing. When a job is done
+        # its detected_language and language_confidence are set (None if there is no speech)
+        options = {"mode": "language", "windows": windows, **options}
+        return self.process_batch(file_paths, None, "transcribe", model, **options)
+
+    def cancel(self, job: Job | None = None) -> None:
+        # Cancels a job, or every job of the current batch.
+        # What was transcribed before cancelling is kept in the job's output file.
+        # The clips of a batch job are cancelled together
+        if job is None:
+            self.queue.cancel_all()
+        else:
+            self.queue.cancel(job.group or job)
+
+    def stop_job(self, job: Job) -> None:
+        # Killing the worker stops the job immediately (see BackendWorker.kill)
+        if job.slot is not None:
+            self.workers[job.slot].kill()
+
+    def expire(self, job: Job) -> None:
+        job.timed_out = True
+        self.stop_job(job)
+
+    def stop(self) -> None:
+        # Stops the workers and removes the transcripts (copy them before).
+        # Jobs are cancelled first: a job whose worker is killed would be retried
+        self.queue.cancel_all()
+        self.loop.run(self.stop_workers()).result()
+        self.loop.stop()
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    async def stop_workers(self) -> None:
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+
+    async def run(self, job: Job, slot: int) -> tuple[bool, str]:
+        # Called by the JobQueue from one of its dispatcher coroutines.
+        # Blocking file work (journal, exports) goes to the default executor
+        if job.clips:
+            return await self.run_clips(job, slot)
+        loop = asyncio.get_running_loop()
+        job.output_path = self.output_path(job)
+
+        def on_message(message):
+            self.handle_message(job, output_file, message)
+
+        message = job.to_message()
+        await loop.run_in_executor(None, self.open_journal, job)
+        if job.resumed_from:
+            message["resume_from"] = job.resumed_from
+            # the language found before, it's not detected again on the rest of the file
+            message["language"] = message["language"] or job.detected_language
+            self.signals.process_info.emit(f"Resuming at {format_timestamp(job.resumed_from)}")
+
+        timeout = job.options.get("timeout") or CONFIG.JOB_TIMEOUT_SECONDS
+        watchdog = loop.call_later(timeout, self.expire, job) if timeout else None
+
+        output_file = await loop.run_in_executor(None, AsyncWriter, job.output_path)
+        try:
+            for segment in job.resumed_segments:
+                self.write_transcript(output_file, segment)
+            succeeded, error = await self.workers[slot].submit(
+                message, on_message, lambda: job.cancelled
+            )
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            await output_file.close()
+            if job.journal is not None:
+                await job.journal.close()
+
+        # kept when the job fails or is cancelled, the next run resumes it
+        if succeeded and job.journal is not None:
+            await job.journal.remove()
+
+        # partial transcripts (cancelled jobs) are exported too
+        if job.segments:
+            job.exports = await loop.run_in_executor(
+                None,
+                export_transcript,
+                job.segments,
+                job.detected_language,
+                os.path.splitext(job.output_path)[0],
+                job.options.get("formats") or CONFIG.EXPORT_FORMATS,
+            )
+
+        if job.cancelled:
+            return False, "Cancelled"
+        if job.timed_out:
+            return False, f"Timed out after {timeout} s"
+        return succeeded, error
+
+    async def run_clips(self, job: Job, slot: int) -> tuple[bool, str]:
+        # A batch job: messages with a "clip" index go to the job and output file of that
+        # clip, a "clip" message ends it. Clips done by an earlier attempt are not sent again
+        loop = asyncio.get_running_loop()
+        clips = [clip for clip in job.clips if clip.state != JobState.DONE]
+        output_files = []
+        for clip in clips:
+            clip.start_attempt()
+            clip.output_path = self.output_path(clip)
+            output_files.append(await loop.run_in_executor(None, AsyncWriter, clip.output_path))
+        # clip index -> error (None if it succeeded)
+        finished: dict[int, str | None] = {}
+
+        def on_message(message):
+            index = message.get("clip")
+            if index is None:
+                self.handle_message(job, None, message)
+            elif message["event"] == protocol.CLIP:
+                finished[index] = message["error"]
+                job.progress = int(100 * len(finished) / len(clips))
+                self.signals.advance_bar.emit(self.queue.batch_progress())
+            else:
+                self.handle_message(clips[index], output_files[index], message)
+
+        message = job.to_message()
+        message["clips"] = [
+            {"path": clip.file_path, "media": clip.options.get("media")} for clip in clips
         ]
+        timeout = job.options.get("timeout") or CONFIG.JOB_TIMEOUT_SECONDS
+        watchdog = loop.call_later(timeout, self.expire, job) if timeout else None
+        try:
+            succeeded, error = await self.workers[slot].submit(
+                message, on_message, lambda: job.cancelled
+            )
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            for output_file in output_files:
+                await output_file.close()
+
+        # clips without a "clip" message follow the batch job (see handle_state)
+        for index, clip_error in finished.items():
+            clip = clips[index]
+            if clip_error is not None:
+                clip.error = clip_error
+                self.queue.set_state(clip, JobState.FAILED)
+                continue
+            if clip.segments:
+                clip.exports = await loop.run_in_executor(
+                    None,
+                    export_transcript,
+                    clip.segments,
+                    clip.detected_language,
+                    os.path.splitext(clip.output_path)[0],
+                    clip.options.get("formats") or CONFIG.EXPORT_FORMATS,
+                )
+            clip.progress = 100
+            self.queue.set_state(clip, JobState.DONE)
+
+        if job.cancelled:
+            return False, "Cancelled"
+        if job.timed_out:
+            return False, f"Timed out after {timeout} s"
+        return succeeded, error
+
+    def output_path(self, job: Job) -> str:
+        name = "stream" if job.file_type == "stream" else pathlib.Path(job.file_path).stem
+        return os.path.join(self.output_dir, CONFIG.OUTPUT_FILE.format(job_id=job.id, name=name))
+
+    def open_journal(self, job: Job) -> None:
+        # Loads the journal of the job (see backend/journal.py): a job that was stopped
+        # starts with the segments it had and the worker goes on from the checkpoint
+        job.journal = None
+        job.resumed_from = 0
+        job.resumed_segments = []
+        # live transcription and language identification jobs are not resumed
+        if job.options.get("mode") or not job.options.get("resume", CONFIG.RESUME_ENABLED):
+            return
+
+        journal = Journal.for_job(job)
+        state = journal.load()
+        journal.open(state)
+        job.journal = journal
+        job.resumed_from = state["offset"]
+        job.resumed_segments = state["segments"]
+        job.segments = list(state["segments"])
+        job.detected_language = state["language"]
+
+    def handle_state(self, job: Job) -> None:
+        if job.state in FINISHED_STATES:
+            wall = time.monotonic() - job.started_at if job.started_at else 0
+            log_metrics(
+                "job",
+                job=job.id,
+                file=job.file_path,
+                state=job.state.value,
+                attempts=job.attempts,
+                audio_seconds=job.duration,
+                seconds=round(wall, 3),
+                rtf=round(wall / job.duration, 4) if job.duration else None,
+                peak_rss_mb=job.peak_rss_mb,
+            )
+
+        self.signals.job_state.emit(job.id, job.state.value)
+        self.signals.job_progress.emit(job.id, job.progress)
+        self.signals.advance_bar.emit(self.queue.batch_progress())
+
+        # the clips of a batch job that are not finished on their own follow it
+        for clip in job.clips:
+            if clip.state in FINISHED_STATES:
+                continue
+            clip.state = job.state
+            if job.state == JobState.DONE:
+                clip.state = JobState.FAILED
+                clip.error = "Missing from the batch result"
+            elif job.state in FINISHED_STATES:
+                clip.error = job.error
+            self.handle_state(clip)
+
+    def handle_idle(self, jobs: list[Job]) -> None:
+        # batch jobs are reported as their clips
+        jobs = [clip for job in jobs for clip in job.clips or [job]]
+        done = [job for job in jobs if job.state == JobState.DONE]
+        failed = [job for job in jobs if job.state == JobState.FAILED]
+        cancelled = [job for job in jobs if job.state == JobState.CANCELLED]
+
+        if len(jobs) > 1:
+            self.signals.process_info.emit(
+                f"{len(done)} done, {len(failed)} failed, {len(cancelled)} cancelled"
+            )
+        elif cancelled:
+            self.signals.process_info.emit("Cancelled, partial transcript kept")
+
+        # cancelled jobs keep what was transcribed until then
+        with_output = [job for job in jobs if job.state != JobState.FAILED and job.output_path]
+        if not with_output:
+            self.signals.process_error.emit(failed[-1].error if failed else "Cancelled")
+            return
 
-        self.signals.process_started.emit()
+        self.signals.process_done.emit(with_output[-1].output_path)
 
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    def handle_message(self, job: Job, output_file, message: dict) -> None:
+        handler = self.handlers.get(message["event"])
+        if handler is not None:
+            handler(job, output_file, message)
 
-        with open(CONFIG.OUTPUT_FILE, "w") as output_file:
-            for line in p.stdout:
-                if VERBOSE:
-                    print(line.decode("utf-8").rstrip())
-                self.handle_line(output_file, line)
+    def on_duration(self, job: Job, output_file, message: dict) -> None:
+        job.duration = message["seconds"]
+        job.tracker.start(job.duration, job.resumed_from)
+        self.queue.set_state(job, JobState.TRANSCRIBING)
+
+    def on_info(self, job: Job, output_file, message: dict) -> None:
+        self.signals.process_info.emit(message["message"])
+
+    def on_model(self, job: Job, output_file, message: dict) -> None:
+        self.signals.process_info.emit(
+            f"Model {message['name']} loaded in {message['load_seconds']:.1f} s"
+            f" ({message['weights_mb']:.0f} MB)"
+        )
+
+    def on_language(self, job: Job, output_file, message: dict) -> None:
+        language = message["language"]
+        if language is None:
+            self.signals.process_info.emit("Detecting language...")
+            return
+
+        job.detected_language = language
+        if "confidence" not in message:
+            if job.journal is not None:
+                job.journal.set_language(language)
+            self.signals.process_info.emit(f"Detected language: {language}".capitalize())
+            return
+
+        # language identification job, its output file is the result
+        job.language_confidence = message["confidence"]
+        output_file.write(f"{message['code']}\t{language}\t{message['confidence']}\n")
+        self.signals.process_info.emit(
+            f"{pathlib.Path(job.file_path).name}: {language} ({message['confidence']:.0%})"
+        )
+
+    def on_segment(self, job: Job, output_file, message: dict) -> None:
+        # replaced by the whole transcript at the end, this is kept if the job is cancelled
+        # only the segment, without the fields of the message (event, clip...)
+        segment = {
+            "start": message["start"],
+            "end": message["end"],
+            "text": message["text"],
+            "words": message.get("words", []),
+        }
+        job.segments.append(segment)
+        if job.journal is not None:
+            job.journal.add_segment(segment)
+        self.write_transcript(output_file, segment)
+        self.signals.segment_final.emit(message["text"].strip())
+
+    def on_partial(self, job: Job, output_file, message: dict) -> None:
+        self.signals.segment_partial.emit(message["text"].strip())
+
+    def on_progress(self, job: Job, output_file, message: dict) -> None:
+        job.tracker.add(message["seconds"], message.get("start", 0))
+        job.progress = job.tracker.percent()
+        if not job.tracker.should_update(force=job.progress == 100):
+            return
 
-        self.signals.process_done.emit(CONFIG.OUTPUT_FILE)
+        self.signals.job_progress.emit(job.id, job.progress)
+        self.signals.advance_bar.emit(self.queue.batch_progress())
+        rtf, eta = job.tracker.rtf(), job.tracker.eta()
+        if rtf is not None and eta is not None:
+            self.signals.process_stats.emit(rtf, eta)
 
-    def handle_line(self, output_file, line):
-        line: str = line.rstrip().decode("utf-8")
+    def on_checkpoint(self, job: Job, output_file, message: dict) -> None:
+        if job.journal is not None:
+            job.journal.checkpoint(message["seconds"])
 
-        for processor in self.processors:
-            processor(line)
+    def on_span(self, job: Job, output_file, message: dict) -> None:
+        if message["name"] == "job":
+            job.peak_rss_mb = message["peak_rss_mb"]
+        fields = {key: value for key, value in message.items() if key != "event"}
+        log_metrics("span", job=job.id, file=job.file_path, **fields)
 
-        progress_made = progress(line)
-        if progress_made:
-            self.write_transcript(output_file, line)
-            my_progress = int(progress_made / CLIP_DURATION * 100)
-            self.signals.advance_bar.emit(my_progress)
+    def on_transcript(self, job: Job, output_file, message: dict) -> None:
+        job.segments = job.resumed_segments + message["segments"]
+        job.detected_language = message["language"]
 
-    def write_transcript(self, output_file, line: str):
-        line = line.split("]")[1].strip()
-        output_file.write(line + "\n")
+    def write_transcript(self, output_file, segment: dict):
+        output_file.write(segment["text"].strip() + "\n")
@@ -0,0 +1,135 @@
+"""
+Bounded memory transcription of long recordings (hours).
+One ffmpeg process decodes the file and it's read in windows: every window is cut at
+its quietest point near the end (what is after the cut goes to the next window),
+pre-processed and transcribed on its own, and its segments are sent with their times in
+the whole file. Only one window is in memory at a time, so the peak memory depends on the
+window length and not on the length of the recording.
+The window length comes from the memory limit, and it's halved when a window goes over it.
+"""
+from contextlib import redirect_stdout
+from typing import Callable, Optional
+
+import numpy as np
+import whisper
+
+# # this import is relative, because windowed.py is used by the backend subprocess
+import config as CONFIG
+import protocol
+from audio import frame_energy
+from chunking import shift_segment, transcribe_chunks
+from language import detect_language
+from preprocess import TimeMap, preprocess_audio
+from resources import rss_mb
+from telemetry import span
+
+
+def window_seconds(memory_limit_mb: Optional[float]) -> float:
+    # Longest window that fits in what is left under the limit (the model is loaded already)
+    if not memory_limit_mb:
+        return CONFIG.WINDOW_SECONDS
+    free_bytes = (memory_limit_mb - rss_mb()) * 1024 * 1024
+    seconds = free_bytes / CONFIG.WINDOW_BYTES_PER_SECOND
+    return max(CONFIG.WINDOW_MIN_SECONDS, min(CONFIG.WINDOW_SECONDS, seconds))
+
+
+def split_window(audio: np.ndarray, search_seconds: float = CONFIG.CHUNK_SEARCH_SECONDS) -> int:
+    # Sample where the window is cut: the quietest frame of its last search_seconds
+    frame_length = CONFIG.VAD_FRAME_SAMPLES
+    tail = audio[-int(search_seconds * CONFIG.SAMPLE_RATE) :]
+    energy = frame_energy(tail, frame_length)
+    if not energy.shape[0]:
+        return audio.shape[0]
+    quietest = int(np.argmin(energy))
+    return audio.shape[0] - tail.shape[0] + quietest * frame_length + frame_length // 2
+
+
+def transcribe_windows(
+    source,
+    model: whisper.Whisper,
+    decode_options: dict,
+    offset: float = 0,
+    memory_limit_mb: Optional[float] = None,
+    preprocess: bool = CONFIG.PREPROCESS_ENABLED,
+    options: Optional[dict] = None,
+    chunk_workers: int = 1,
+    on_chunk_segments: Optional[Callable] = None,
+) -> tuple[list[dict], str]:
+    # source: read(seconds) -> array or None at the end (see streaming.FfmpegSource),
+    # starting at offset seconds of the media. Returns the segments and the language.
+    # With chunk_workers > 1 every window is split in chunks transcribed in parallel (see
+    # chunking.py, options are the model load options), their segments go to
+    # on_chunk_segments
+    decode_options = dict(decode_options)
+    seconds = window_seconds(memory_limit_mb)
+    carry = np.zeros(0, dtype=np.float32)
+    segments: list[dict] = []
+
+    while True:
+        wanted = max(seconds - carry.shape[0] / CONFIG.SAMPLE_RATE, CONFIG.CHUNK_SEARCH_SECONDS)
+        new_audio = source.read(wanted)
+        finished = new_audio is None or new_audio.shape[0] < int(wanted * CONFIG.SAMPLE_RATE)
+        window = carry if new_audio is None else np.concatenate((carry, new_audio))
+        del new_audio
+        if not window.shape[0]:
+            break
+
+        cut = window.shape[0] if finished else split_window(window)
+        # copied, so the window can be freed
+        audio, carry = window[:cut], window[cut:].copy()
+        del window
+
+        time_map = TimeMap.identity()
+        if preprocess:
+            audio, time_map = preprocess_audio(audio)
+        time_map = time_map.shifted(offset)
+
+        if decode_options.get("language") is None:
+            seconds_used = min(audio.shape[0] / CONFIG.SAMPLE_RATE, CONFIG.LANGUAGE_WINDOW_SECONDS)
+            with span("language", seconds_used):
+                decode_options["language"] = detect_language(model, audio)
+
+        if chunk_workers > 1 and audio.shape[0] > CONFIG.CHUNK_MIN_SECONDS * CONFIG.SAMPLE_RATE:
+            # the text of the previous window only comes before the first chunk
+            window_segments, _ = transcribe_chunks(
+                audio,
+                model,
+                options,
+                {**decode_options, "initial_prompt": None},
+                chunk_workers,
+                on_chunk_segments,
+                time_map,
+            )
+        else:
+            # segments, progress and checkpoints are sent while whisper prints them
+            with redirect_stdout(protocol.WhisperOutput(time_map.to_original)):
+                result = model.transcribe(
+                    audio, verbose=True, word_timestamps=True, **decode_options
+                )
+            window_segments = [
+                time_map.remap_segment(shift_segment(segment, 0))
+                for segment in result["segments"]
+            ]
+            del result
+        segments.extend(window_segments)
+        # measured while the window is still in memory
+        over_limit = memory_limit_mb and rss_mb() > memory_limit_mb
+        del audio
+
+        offset += cut / CONFIG.SAMPLE_RATE
+        protocol.send(protocol.PROGRESS, seconds=offset)
+        protocol.send(protocol.CHECKPOINT, seconds=offset)
+        # the next window goes on from the text of this one
+        if window_segments:
+            decode_options["initial_prompt"] = window_segments[-1]["text"]
+
+        if over_limit and seconds > CONFIG.WINDOW_MIN_SECONDS:
+            seconds = max(CONFIG.WINDOW_MIN_SECONDS, seconds / 2)
+            protocol.send(
+                protocol.INFO,
+                message=f"Over the memory limit, using windows of {seconds:.0f} s",
+            )
+        if finished and not carry.shape[0]:
+            break
+
+    return segments, decode_options["language"]
@@ -0,0 +1,179 @@
+"""
+Long-lived backend process. Whisper (and torch) are imported and the model is
+loaded once, then every job is served by the same interpreter.
+
+Protocol, one job per line on stdin (JSON):
+    {"id": 1, "path": "a.mp4", "file_type": "video", "language": null, "task": "transcribe",
+     "model": "tiny", "device": "cpu", "precision": "fp32", "threads": 4, "model_dir": null,
+     "chunk_workers": 4, "preprocess": true, "cache": true, "workdir": "/tmp/openverbum-job-x",
+     "media": {...}}
+Only "id", "path", "file_type" and "task" are required, the rest have the defaults of config.py.
+"media" is the probe of the file done by the wrapper (see probe.py), probed again if missing.
+"resume_from" (seconds) continues a job that was stopped, see journal.py.
+"memory_limit_mb" transcribes the file in windows sized to stay under it (see windowed.py),
+files longer than WINDOWED_MIN_SECONDS are always transcribed that way.
+Live transcription jobs have "mode": "stream", "path" is the source and "source_type"
+is "wav" (file being written or pipe) or "ffmpeg" (ffmpeg input arguments).
+Language identification jobs have "mode": "language" (and optionally "windows"), they only
+answer with the "language" message (see language.py).
+Batch jobs ("mode": "batch") transcribe short clips together, "clips" is a list of
+{"path", "media"} and "path" is not used. Every message about a clip has its index as
+"clip" (see batching.py and protocol.py).
+Warm-up jobs ("mode": "warmup") import the backend and load the model, so the first real
+job doesn't wait for them. Their "span" messages measure the cold start.
+
+Every job answers with messages on stdout (see protocol.py), and always ends with
+exactly one "done" or "failed" message. Anything else printed goes to stderr.
+The worker exits when stdin is closed (i.e. when the GUI process goes away).
+"""
+import json
+import sys
+import tempfile
+import traceback
+
+# # this import is relative, because worker.py is opened as subprocess
+import cache
+import config as CONFIG
+import protocol
+from resources import reset_peak_rss
+from telemetry import span
+
+
+def load_backend() -> None:
+    # whisper and torch take seconds to import, so they are imported by the first job
+    # (or the warm-up) and measured as the "import" span, the worker reads stdin right away
+    if "voice_backend" in sys.modules:
+        return
+    with span("import"):
+        import language  # noqa: F401
+        import voice_backend  # noqa: F401
+
+
+def run_job(job: dict) -> None:
+    load_backend()
+    import voice_backend as backend
+    from language import identify_language
+    from models import model_options, warm_up
+    from probe import probe_media
+
+    task = job["task"]
+    backend.check_task(task)
+
+    options = model_options(
+        job.get("model"),
+        job.get("device"),
+        job.get("precision"),
+        job.get("threads"),
+        job.get("model_dir"),
+    )
+    if job.get("mode") == "stream":
+        backend.stream_audio(
+            job["path"],
+            job.get("source_type") or "wav",
+            job.get("language") or None,
+            task,
+            options=options,
+            step=job.get("step") or CONFIG.STREAM_STEP_SECONDS,
+        )
+        return
+    if job.get("mode") == "warmup":
+        warm_up(options)
+        return
+    if job.get("mode") == "batch":
+        backend.transcribe_batch(
+            job["clips"],
+            job.get("language") or None,
+            task,
+            options=options,
+            preprocess=job.get("preprocess", CONFIG.PREPROCESS_ENABLED),
+            use_cache=job.get("cache", CONFIG.CACHE_ENABLED),
+            memory_limit_mb=job.get("memory_limit_mb") or CONFIG.MEMORY_LIMIT_MB,
+        )
+        return
+    if job.get("mode") == "language":
+        identify_language(
+            job["path"],
+            options,
+            windows=job.get("windows") or CONFIG.LANGUAGE_WINDOWS,
+            use_cache=job.get("cache", CONFIG.CACHE_ENABLED),
+            media=job.get("media"),
+        )
+        return
+
+    language = job.get("language") or None
+    preprocess = job.get("preprocess", CONFIG.PREPROCESS_ENABLED)
+    resume_from = job.get("resume_from") or 0
+    key = None
+    # a resumed job was not in the cache, and the wrapper already has its first segments
+    if job.get("cache", CONFIG.CACHE_ENABLED) and not resume_from:
+        key = cache.cache_key(job["path"], options, language, task, preprocess)
+        cached = cache.load(key)
+        if cached is not None:
+            protocol.send(protocol.INFO, message=CONFIG.CACHE_HIT_MSG)
+            backend.replay_transcript(cached["duration"], cached["segments"], cached["language"])
+            return
+        protocol.send(protocol.INFO, message=CONFIG.CACHE_MISS_MSG)
+
+    media = job.get("media") or probe_media(job["path"])
+    memory_limit_mb = job.get("memory_limit_mb") or CONFIG.MEMORY_LIMIT_MB
+    chunk_workers = job.get("chunk_workers") or CONFIG.CHUNK_WORKERS
+    if memory_limit_mb or (media["duration"] or 0) > CONFIG.WINDOWED_MIN_SECONDS:
+        # bounded memory. The chunk workers transcribe the chunks of every window, but not
+        # with a memory limit (every one would need its own memory)
+        duration = media["duration"] or 0
+        transcript = backend.transcribe_windowed(
+            job["path"],
+            media,
+            language,
+            task,
+            options=options,
+            preprocess=preprocess,
+            offset=resume_from,
+            memory_limit_mb=memory_limit_mb,
+            chunk_workers=1 if memory_limit_mb else chunk_workers,
+        )
+    else:
+        audio = backend.file_to_audio(job["path"], media, start=resume_from)
+        duration = backend.audio_length(audio, offset=resume_from)
+        transcript = backend.transcribe_audio(
+            audio,
+            language,
+            task,
+            options=options,
+            chunk_workers=chunk_workers,
+            preprocess=preprocess,
+            offset=resume_from,
+        )
+    if key is not None:
+        cache.store(key, duration, transcript["language"], transcript["segments"])
+
+
+def serve(stream=sys.stdin) -> None:
+    for raw_job in stream:
+        if not raw_job.strip():
+            continue
+
+        job_id = None
+        try:
+            job = json.loads(raw_job)
+            job_id = job["id"]
+            # temporary files of the job go to its own folder, removed by the wrapper
+            tempfile.tempdir = job.get("workdir") or None
+            # the "job" span has the peak memory of this job only
+            reset_peak_rss()
+            with span("job"):
+                run_job(job)
+        except Exception as error:
+            traceback.print_exc(file=sys.stderr)
+            protocol.send(protocol.FAILED, id=job_id, error=str(error))
+        else:
+            protocol.send(protocol.DONE, id=job_id)
+        finally:
+            tempfile.tempdir = None
+
+
+if __name__ == "__main__":
+    # stdout only carries protocol messages
+    protocol.OUTPUT = sys.stdout
+    sys.stdout = sys.stderr
+    serve()
@@ -0,0 +1,269 @@
+"""
+Benchmark of the transcription pipeline, per stage:
+decoding (file_to_audio), duration (audio_length), model load, language detection,
+transcription and the wrapper's message handling (what handle_line used to do).
+
+Fixtures are generated with ffmpeg (no network needed, but the model has to be
+downloaded already, see --model-dir). Speech is synthesized with ffmpeg's flite source
+when available, otherwise tones and noise are used. Real recordings can be added
+with --fixtures.
+
+    python benchmarks/bench_pipeline.py --model tiny --durations 30,120 -o results.json
+    python benchmarks/bench_pipeline.py --compare old.json new.json
+"""
+# Locals
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# the backend modules import each other as the worker does (see backend/worker.py)
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+# Backend
+import config as CONFIG  # noqa: E402
+import protocol  # noqa: E402
+from audio import audio_duration  # noqa: E402
+from resources import peak_rss_mb, reset_peak_rss  # noqa: E402
+
+SPEECH = (
+    "The quick brown fox jumps over the lazy dog. "
+    "OpenVerbum turns recordings into text, one segment at a time. "
+)
+STAGES = ["decode", "duration", "model_load", "language", "transcribe", "messages"]
+
+
+class NullOutput:
+    # protocol messages sent by the backend functions are not needed here
+    def write(self, text: str) -> int:
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+@contextmanager
+def timed(results: dict, stage: str):
+    start = time.perf_counter()
+    yield
+    results[stage] = results.get(stage, 0) + time.perf_counter() - start
+
+
+def has_flite() -> bool:
+    filters = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-filters"], capture_output=True, text=True
+    ).stdout
+    return " flite " in filters
+
+
+def generate_fixture(folder: str, seconds: int, kind: str, speech: bool) -> str:
+    # kind: "wav", "mp3" or "mp4"
+    path = os.path.join(folder, f"fixture-{seconds}s.{kind}")
+    if speech:
+        repeats = max(1, seconds // 8)
+        audio = f"flite=text='{SPEECH * repeats}',apad,atrim=0:{seconds}"
+    else:
+        audio = f"sine=frequency=440:duration={seconds},volume=0.3"
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", audio]
+    if kind == "mp4":
+        video = f"testsrc=size=320x240:rate=15:duration={seconds}"
+        cmd += ["-f", "lavfi", "-i", video, "-shortest", "-c:v", "libx264", "-preset", "ultrafast"]
+    cmd.append(path)
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def bench_messages(segments: list[dict], duration: float, repeats: int) -> float:
+    # Time spent by VoiceProcessor dispatching the messages of a job
+    from backend.jobs import Job
+    from backend.voice_wrapper import VoiceProcessor
+    from cli import CliSignals
+
+    processor = VoiceProcessor(CliSignals())
+    job = Job("fixture", "audio", None, "transcribe")
+    job.duration = duration
+    messages = []
+    for segment in segments:
+        messages.append({"event": protocol.SEGMENT, **segment})
+        messages.append({"event": protocol.PROGRESS, "seconds": segment["end"]})
+    lines = [json.dumps(message).encode() for message in messages]
+
+    with open(os.devnull, "w") as output_file:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for line in lines:
+                processor.handle_message(job, output_file, protocol.decode(line))
+        elapsed = (time.perf_counter() - start) / repeats
+
+    processor.stop()
+    return elapsed
+
+
+def bench_file(path: str, options: dict) -> dict:
+    from voice_backend import audio_length, file_to_audio
+    from language import language_probabilities
+    from models import load_model
+
+    # the peak of this file only, when the platform can reset it (Linux)
+    per_file_peak = reset_peak_rss()
+    stages: dict = {}
+    with timed(stages, "decode"):
+        audio = file_to_audio(path)
+    with timed(stages, "duration"):
+        duration = audio_length(audio)
+
+    # loaded every time on purpose, it's one of the stages
+    with timed(stages, "model_load"):
+        model, _ = load_model(options)
+
+    with timed(stages, "language"):
+        probs = language_probabilities(model, audio)
+        language = max(probs, key=probs.get)
+
+    with timed(stages, "transcribe"):
+        result = model.transcribe(
+            audio, language=language, verbose=None, word_timestamps=True, fp16=False
+        )
+
+    segments = [
+        {"start": s["start"], "end": s["end"], "text": s["text"], "words": s.get("words", [])}
+        for s in result["segments"]
+    ]
+    stages["messages"] = bench_messages(segments, duration, repeats=20)
+
+    total = sum(stages.values())
+    return {
+        "file": os.path.basename(path),
+        "audio_seconds": round(audio_duration(audio), 3),
+        "segments": len(segments),
+        "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        "total_seconds": round(total, 4),
+        # processing time / audio time, lower is better
+        "real_time_factor": round(total / max(duration, 1e-9), 4),
+        "transcribe_rtf": round(stages["transcribe"] / max(duration, 1e-9), 4),
+        "files_per_hour": round(3600 / total, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1) if per_file_peak else None,
+    }
+
+
+def environment(options: dict) -> dict:
+    import torch
+
+    try:
+        revision = subprocess.run(
+            ["git", "-C", ROOT, "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+
+    return {
+        "revision": revision,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "torch": torch.__version__,
+        "model": options,
+    }
+
+
+def run(args) -> dict:
+    from models import model_options
+
+    options = model_options(args.model, args.device, args.precision, args.threads, args.model_dir)
+    protocol.OUTPUT = NullOutput()
+
+    results = {"environment": environment(options), "files": []}
+    with tempfile.TemporaryDirectory(prefix="openverbum-bench-") as folder:
+        speech = has_flite()
+        fixtures = []
+        for seconds in (int(value) for value in args.durations.split(",")):
+            for kind in args.kinds.split(","):
+                fixtures.append(generate_fixture(folder, seconds, kind, speech))
+        fixtures += args.fixtures
+
+        for path in fixtures:
+            file_result = bench_file(path, options)
+            results["files"].append(file_result)
+            print(
+                f"{file_result['file']:<24} rtf {file_result['real_time_factor']:.3f}  "
+                + "  ".join(f"{k} {v:.3f}s" for k, v in file_result["stages"].items())
+            )
+
+    files = results["files"]
+    total_audio = sum(f["audio_seconds"] for f in files)
+    total_time = sum(f["total_seconds"] for f in files)
+    results["summary"] = {
+        "files": len(files),
+        "audio_seconds": round(total_audio, 3),
+        "total_seconds": round(total_time, 4),
+        "real_time_factor": round(total_time / max(total_audio, 1e-9), 4),
+        "files_per_hour": round(3600 * len(files) / max(total_time, 1e-9), 1),
+        # the peak is reset per file, the highest one is the peak of the run
+        "peak_rss_mb": round(
+            max([peak_rss_mb()] + [f["peak_rss_mb"] for f in files if f["peak_rss_mb"]]), 1
+        ),
+        "stages": {
+            stage: round(sum(f["stages"][stage] for f in files), 4) for stage in STAGES
+        },
+        "speech_fixtures": speech,
+    }
+    return results
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file)["summary"], json.load(new_file)["summary"]
+
+    def row(name: str, before: float, after: float) -> None:
+        change = (after - before) / before * 100 if before else 0
+        print(f"{name:<18} {before:>12.4f} {after:>12.4f} {change:>+8.1f}%")
+
+    print(f"{'':<18} {'old':>12} {'new':>12} {'change':>9}")
+    for stage in STAGES:
+        row(stage, old["stages"].get(stage, 0), new["stages"].get(stage, 0))
+    for key in ("total_seconds", "real_time_factor", "files_per_hour", "peak_rss_mb"):
+        row(key, old[key], new[key])
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="OpenVerbum pipeline benchmark")
+    parser.add_argument("--model", default=CONFIG.DEFAULT_MODEL)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--threads", type=int, default=CONFIG.TORCH_THREADS)
+    parser.add_argument("--model-dir", default=CONFIG.MODEL_DIR)
+    parser.add_argument("--durations", default="10,60", help="seconds of each generated fixture")
+    parser.add_argument("--kinds", default="wav,mp3,mp4", help="generated fixture containers")
+    parser.add_argument("--fixtures", nargs="*", default=[], help="extra media files")
+    parser.add_argument("-o", "--output", default="bench-results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    results = run(args)
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    summary = results["summary"]
+    print(
+        f"{summary['files']} files, rtf {summary['real_time_factor']:.3f}, "
+        f"{summary['files_per_hour']:.0f} files/hour, peak RSS {summary['peak_rss_mb']:.0f} MB"
+        f" -> {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
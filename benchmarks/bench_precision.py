@@ -0,0 +1,171 @@
+"""
+Accuracy and speed of the model precisions (fp32, int8...) on a set of reference clips,
+to check what int8 saves in real-time factor and costs in word error rate before using it.
+
+    python benchmarks/bench_precision.py --model base --clips refs/*.wav -o precision.json
+
+Every clip has its reference transcript next to it (talk.wav -> talk.txt). Without
+--clips, speech fixtures are generated with ffmpeg's flite source and their text is the
+reference. The first precision is the baseline of the speedup and of the WER change.
+Models are loaded twice: the second int8 load reads the quantized model from QUANTIZED_DIR.
+"""
+# Locals
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# the backend modules import each other as the worker does (see backend/worker.py)
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+# Backend
+import config as CONFIG  # noqa: E402
+import protocol  # noqa: E402
+from audio import audio_duration  # noqa: E402
+from bench_pipeline import SPEECH, NullOutput, has_flite  # noqa: E402
+
+
+def words(text: str) -> list[str]:
+    # Lowercase words without punctuation, so only recognition errors count
+    return re.findall(r"[\w']+", text.lower())
+
+
+def word_errors(reference: list[str], hypothesis: list[str]) -> int:
+    # Word level edit distance (substitutions + deletions + insertions)
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (ref_word != hyp_word),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def generate_clips(folder: str, count: int) -> list[str]:
+    # Speech fixtures with a known text, one sentence more in each
+    sentences = [sentence.strip() + "." for sentence in SPEECH.split(".") if sentence.strip()]
+    clips = []
+    for index in range(count):
+        text = " ".join(sentences[: index % len(sentences) + 1] * (index // len(sentences) + 1))
+        path = os.path.join(folder, f"clip-{index}.wav")
+        cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"flite=text='{text}'"]
+        subprocess.run(cmd + [path], check=True)
+        with open(os.path.splitext(path)[0] + ".txt", "w") as reference_file:
+            reference_file.write(text)
+        clips.append(path)
+    return clips
+
+
+def bench_precision(precision: str, clips: list[tuple], args) -> dict:
+    from models import load_model, model_options
+
+    options = model_options(args.model, "cpu", precision, args.threads, args.model_dir)
+    # the first load of int8 quantizes and saves the model, the second one reads it
+    _, first_stats = load_model(options)
+    model, stats = load_model(options)
+
+    errors = reference_words = 0
+    audio_seconds = transcribe_seconds = 0.0
+    files = []
+    for path, audio, reference in clips:
+        start = time.perf_counter()
+        result = model.transcribe(audio, language=args.language, verbose=None, fp16=False)
+        elapsed = time.perf_counter() - start
+
+        clip_errors = word_errors(reference, words(result["text"]))
+        errors += clip_errors
+        reference_words += len(reference)
+        audio_seconds += audio_duration(audio)
+        transcribe_seconds += elapsed
+        files.append(
+            {
+                "file": os.path.basename(path),
+                "seconds": round(elapsed, 3),
+                "wer": round(clip_errors / max(len(reference), 1), 4),
+                "text": result["text"].strip(),
+            }
+        )
+
+    return {
+        "precision": precision,
+        "first_load_seconds": first_stats["load_seconds"],
+        "load_seconds": stats["load_seconds"],
+        "weights_mb": stats["weights_mb"],
+        "audio_seconds": round(audio_seconds, 3),
+        "transcribe_seconds": round(transcribe_seconds, 3),
+        # processing time / audio time, lower is better
+        "real_time_factor": round(transcribe_seconds / max(audio_seconds, 1e-9), 4),
+        "wer": round(errors / max(reference_words, 1), 4),
+        "files": files,
+    }
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="OpenVerbum precision comparison")
+    parser.add_argument("--model", default=CONFIG.DEFAULT_MODEL)
+    parser.add_argument("--precisions", default="fp32,int8", help="first one is the baseline")
+    parser.add_argument("--threads", type=int, default=CONFIG.TORCH_THREADS)
+    parser.add_argument("--model-dir", default=CONFIG.MODEL_DIR)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--clips", nargs="*", default=[], help="media files with a .txt next")
+    parser.add_argument("--generated", type=int, default=6, help="fixtures without --clips")
+    parser.add_argument("-o", "--output", default="bench-precision.json")
+    args = parser.parse_args(argv)
+
+    from voice_backend import file_to_audio
+
+    protocol.OUTPUT = NullOutput()
+    precisions = args.precisions.split(",")
+    unknown = [precision for precision in precisions if precision not in CONFIG.PRECISIONS]
+    if unknown:
+        parser.error(f"Unknown precision {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory(prefix="openverbum-bench-") as folder:
+        paths = args.clips
+        if not paths:
+            if not has_flite():
+                parser.error("ffmpeg has no flite source, pass reference clips with --clips")
+            paths = generate_clips(folder, args.generated)
+
+        clips = []
+        for path in paths:
+            with open(os.path.splitext(path)[0] + ".txt") as reference_file:
+                clips.append((path, file_to_audio(path), words(reference_file.read())))
+
+        results = [bench_precision(precision, clips, args) for precision in precisions]
+
+    baseline = results[0]
+    for result in results:
+        result["speedup"] = round(
+            baseline["real_time_factor"] / max(result["real_time_factor"], 1e-9), 3
+        )
+        result["wer_change"] = round(result["wer"] - baseline["wer"], 4)
+
+    with open(args.output, "w") as output_file:
+        json.dump({"model": args.model, "results": results}, output_file, indent=2)
+
+    print(f"{'':<6} {'load s':>8} {'weights MB':>11} {'rtf':>8} {'speedup':>8} {'wer':>7}")
+    for result in results:
+        print(
+            f"{result['precision']:<6} {result['load_seconds']:>8.2f}"
+            f" {result['weights_mb']:>11.0f} {result['real_time_factor']:>8.4f}"
+            f" {result['speedup']:>7.2f}x {result['wer']:>7.2%} ({result['wer_change']:+.2%})"
+        )
+    print(f"-> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""
+Benchmark of the start of the application: cold versus warm backend.
+
+    cold: a new worker gets a job right away, it pays the backend imports and the model load
+    warm: a new worker is warmed up first (as main.py does once the window is shown),
+          then gets the same job
+
+Also measures how long the GUI modules take to import (needs PyQt6 installed).
+Fixtures are generated as in bench_pipeline.py, the model has to be downloaded already.
+
+    python benchmarks/bench_startup.py --model tiny --seconds 10 -o startup.json
+"""
+# Locals
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Backend
+import backend.config as CONFIG  # noqa: E402
+import backend.protocol as protocol  # noqa: E402
+from backend.voice_wrapper import BackendWorker  # noqa: E402
+from bench_pipeline import generate_fixture, has_flite  # noqa: E402
+
+
+def import_seconds(modules: list[str]) -> float | None:
+    # Wall time of a new interpreter importing the modules, None if they can't be imported
+    code = f"import {', '.join(modules)}"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True)
+    elapsed = time.perf_counter() - start
+    return round(elapsed, 3) if result.returncode == 0 else None
+
+
+async def run_job(worker: BackendWorker, job: dict) -> dict:
+    # Wall time until the first segment and until the end, plus the spans of the job
+    timings = {"spans": {}}
+    start = time.perf_counter()
+
+    def on_message(message):
+        if message["event"] == protocol.SPAN:
+            timings["spans"][message["name"]] = message["seconds"]
+        elif message["event"] == protocol.SEGMENT and "first_segment_seconds" not in timings:
+            timings["first_segment_seconds"] = round(time.perf_counter() - start, 3)
+
+    succeeded, error = await worker.submit(job, on_message)
+    if not succeeded:
+        raise RuntimeError(error)
+    timings["seconds"] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+async def bench(job: dict, options: dict) -> dict:
+    results = {}
+
+    worker = BackendWorker()
+    try:
+        results["cold"] = await run_job(worker, job)
+    finally:
+        await worker.stop()
+
+    worker = BackendWorker()
+    try:
+        warmup = {"mode": "warmup", "task": "transcribe", **options}
+        results["warmup"] = await run_job(worker, warmup)
+        results["warm"] = await run_job(worker, job)
+    finally:
+        await worker.stop()
+
+    results["saved_seconds"] = round(results["cold"]["seconds"] - results["warm"]["seconds"], 3)
+    return results
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="OpenVerbum cold and warm start benchmark")
+    parser.add_argument("--model", default=CONFIG.DEFAULT_MODEL)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--model-dir", default=CONFIG.MODEL_DIR)
+    parser.add_argument("--seconds", type=int, default=10, help="length of the fixture")
+    parser.add_argument("-o", "--output", default="bench-startup.json")
+    args = parser.parse_args(argv)
+
+    # the worker script is found relative to the repository (see backend_script_path)
+    os.chdir(ROOT)
+    options = {
+        "model": args.model,
+        "device": args.device,
+        "precision": args.precision,
+        "model_dir": args.model_dir,
+    }
+    results = {
+        "gui_import_seconds": import_seconds(["frontend.ui", "backend.voice_wrapper"]),
+        "wrapper_import_seconds": import_seconds(["backend.voice_wrapper"]),
+    }
+
+    with tempfile.TemporaryDirectory(prefix="openverbum-bench-") as folder:
+        path = generate_fixture(folder, args.seconds, "wav", has_flite())
+        job = {"path": path, "file_type": "audio", "task": "transcribe", "cache": False}
+        results.update(asyncio.run(bench({**job, **options}, options)))
+
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+
+    cold, warm = results["cold"], results["warm"]
+    print(f"GUI imports      {results['gui_import_seconds']} s")
+    print(f"warm-up          {results['warmup']['seconds']:.3f} s {results['warmup']['spans']}")
+    print(f"cold job         {cold['seconds']:.3f} s {cold['spans']}")
+    print(f"warm job         {warm['seconds']:.3f} s {warm['spans']}")
+    print(f"saved            {results['saved_seconds']:.3f} s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
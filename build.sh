@@ -1,3 +1,3 @@
 #!/bin/bash
-python -m PyInstaller -F --add-data backend/voice_backend.py:. --add-data backend/config.py:. --onefile --name OpenVerbum main.py
+python -m PyInstaller -F --add-data backend/voice_backend.py:. --add-data backend/config.py:. --add-data backend/worker.py:. --add-data backend/audio.py:. --add-data backend/chunking.py:. --add-data backend/streaming.py:. --add-data backend/protocol.py:. --add-data backend/models.py:. --add-data backend/resources.py:. --add-data backend/cache.py:. --add-data backend/telemetry.py:. --add-data backend/language.py:. --add-data backend/probe.py:. --add-data backend/preprocess.py:. --add-data backend/windowed.py:. --add-data backend/batching.py:. --onefile --name OpenVerbum main.py
 
@@ -0,0 +1,345 @@
+"""
+Headless command line interface, no Qt needed.
+
+    python cli.py recordings/*.mp3 talk.mp4 -o transcripts --workers 2
+"""
+# Locals
+import argparse
+import glob
+import os
+import pathlib
+import sys
+from shutil import copyfile
+from threading import Event
+
+# Backend
+import backend.config as CONFIG
+import backend.voice_wrapper as voice_wrapper
+from backend.jobs import FINISHED_STATES, JobState
+from backend.utils import describe_models, is_media_file
+
+# exit status after Ctrl+C (128 + SIGINT), as shells report it
+EXIT_INTERRUPTED = 130
+
+
+class Signal:
+    # Same interface as the pyqtSignal attributes used by the backend
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot) -> None:
+        self.slots.append(slot)
+
+    def emit(self, *args) -> None:
+        for slot in self.slots:
+            slot(*args)
+
+
+class CliSignals:
+    # Mirrors frontend.ui.Signals
+    def __init__(self):
+        self.process_error = Signal()
+        self.process_info = Signal()
+        self.process_started = Signal()
+        self.process_done = Signal()
+        self.advance_bar = Signal()
+        self.process_stats = Signal()
+        self.job_state = Signal()
+        self.job_progress = Signal()
+        self.segment_partial = Signal()
+        self.segment_final = Signal()
+
+
+def expand_inputs(patterns: list[str]) -> list[str]:
+    # Paths, globs and folders (searched recursively) to a list of media files
+    paths: list[str] = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) or [pattern]
+        for match in sorted(matches):
+            if os.path.isdir(match):
+                paths.extend(
+                    str(path)
+                    for path in sorted(pathlib.Path(match).rglob("*"))
+                    if path.is_file() and is_media_file(str(path))
+                )
+            else:
+                paths.append(match)
+
+    # keeps the order, removes duplicates
+    return list(dict.fromkeys(paths))
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OpenVerbum headless transcription")
+    parser.add_argument("inputs", nargs="*", help="media files, globs or folders")
+    parser.add_argument("-o", "--output-dir", default="transcripts")
+    parser.add_argument("-m", "--model", choices=list(CONFIG.MODELS), default=CONFIG.DEFAULT_MODEL)
+    parser.add_argument("--device", choices=CONFIG.DEVICES, default=CONFIG.DEFAULT_DEVICE)
+    parser.add_argument(
+        "--precision", choices=CONFIG.PRECISIONS, default=CONFIG.DEFAULT_PRECISION
+    )
+    parser.add_argument(
+        "--threads", type=int, default=CONFIG.TORCH_THREADS, help="torch threads (0 = default)"
+    )
+    parser.add_argument("--model-dir", default=CONFIG.MODEL_DIR, help="model download folder")
+    parser.add_argument(
+        "--list-models", action="store_true", help="show the models and their measured costs"
+    )
+    parser.add_argument("-l", "--language", default=None, help="default: automatic")
+    parser.add_argument("-t", "--task", choices=["transcribe", "translate"], default="transcribe")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=CONFIG.MAX_CONCURRENT_JOBS,
+        help="backend workers running at the same time",
+    )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=CONFIG.CHUNK_WORKERS,
+        help="processes transcribing chunks of each long file in parallel"
+        " (0 = from the cores and the free memory, 1 = no chunking)",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=float,
+        default=CONFIG.MEMORY_LIMIT_MB,
+        help="MB per worker, files are transcribed in windows that fit in it",
+    )
+    parser.add_argument(
+        "-f",
+        "--formats",
+        default="txt",
+        help=f"comma separated export formats ({', '.join(CONFIG.EXPORT_FORMATS)})",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=CONFIG.JOB_TIMEOUT_SECONDS,
+        help="seconds after which a job is stopped",
+    )
+    parser.add_argument(
+        "--no-preprocess",
+        action="store_true",
+        help="transcribe the audio as it is, without cutting silences or normalizing it",
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="start stopped jobs from zero instead of resuming them",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=f"transcribe clips up to {CONFIG.BATCH_MAX_SECONDS} s together (no word timestamps)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="always transcribe, ignoring cached transcripts"
+    )
+    parser.add_argument(
+        "--detect-language",
+        action="store_true",
+        help="only identify the language of every input, written to languages.tsv",
+    )
+    parser.add_argument(
+        "--language-windows",
+        type=int,
+        default=CONFIG.LANGUAGE_WINDOWS,
+        help=f"{CONFIG.LANGUAGE_WINDOW_SECONDS} s windows sampled for --detect-language",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="live transcription, inputs are sources that are still being written",
+    )
+    parser.add_argument(
+        "--source-type",
+        choices=["wav", "ffmpeg"],
+        default="wav",
+        help="wav: growing WAV file or pipe, ffmpeg: ffmpeg input arguments",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def output_base(paths: list[str]) -> str:
+    # Deepest folder with all the input files: the outputs keep the folders below it, so
+    # files with the same name in different folders don't overwrite each other
+    folders = [os.path.dirname(os.path.abspath(path)) for path in paths if os.path.isfile(path)]
+    try:
+        return os.path.commonpath(folders) if folders else ""
+    except ValueError:
+        # different drives (Windows), only the file names are kept
+        return ""
+
+
+def output_path(output_dir: str, base: str, file_path: str, fmt: str, used: set) -> str:
+    # talk.mp3 -> output_dir/talk.txt, day1/talk.mp3 -> output_dir/day1/talk.txt.
+    # Streams and files out of base keep their name only. talk.mp3 and talk.wav
+    # in the same folder: the second one is output_dir/talk.wav.txt
+    if base and os.path.isfile(file_path):
+        relative = os.path.relpath(os.path.abspath(file_path), base)
+    else:
+        relative = pathlib.Path(file_path).name
+    destination = os.path.join(output_dir, str(pathlib.Path(relative).with_suffix(f".{fmt}")))
+    if destination in used:
+        destination = os.path.join(output_dir, f"{relative}.{fmt}")
+    used.add(destination)
+    return destination
+
+
+def write_languages(processor, jobs: list, output_dir: str, failed: int) -> int:
+    # path, language and confidence of every file, so batches can be split by language.
+    # failed: files that were not accepted
+    destination = os.path.join(output_dir, "languages.tsv")
+    with open(destination, "w") as languages_file:
+        languages_file.write("path\tlanguage\tconfidence\n")
+        for job in jobs:
+            if job.state == JobState.FAILED:
+                failed += 1
+                print(f"Failed: {job.file_path} ({job.error})", file=sys.stderr)
+                continue
+            confidence = "" if job.language_confidence is None else job.language_confidence
+            row = f"{job.file_path}\t{job.detected_language or ''}\t{confidence}"
+            languages_file.write(row + "\n")
+            print(row)
+
+    print(f"-> {destination}")
+    processor.stop()
+    return 1 if failed else 0
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    voice_wrapper.VERBOSE = args.verbose
+
+    if args.list_models:
+        for name, description in describe_models():
+            print(f"{name:<10} {description}")
+        return 0
+
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in CONFIG.EXPORT_FORMATS]
+    if unknown or not formats:
+        print(f"Unknown export formats: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    paths = args.inputs if args.stream else expand_inputs(args.inputs)
+    if not paths:
+        print("No input files found", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    signals = CliSignals()
+    processor = voice_wrapper.VoiceProcessor(signals, args.workers)
+    finished = Event()
+    jobs = []
+
+    def check_finished() -> None:
+        if jobs and all(job.state in FINISHED_STATES for job in jobs):
+            finished.set()
+
+    def on_state(job_id: int, state: str):
+        print(f"[job {job_id}] {state}")
+        check_finished()
+
+    signals.job_state.connect(on_state)
+    signals.process_error.connect(lambda message: print(f"Error: {message}", file=sys.stderr))
+    if args.verbose:
+        signals.process_info.connect(print)
+
+    options = {
+        "device": args.device,
+        "precision": args.precision,
+        "threads": args.threads,
+        "model_dir": args.model_dir,
+        "preprocess": not args.no_preprocess,
+        "resume": not args.no_resume,
+        "cache": not args.no_cache,
+        "batch": args.batch,
+        "timeout": args.timeout,
+        "formats": formats,
+    }
+
+    if args.stream:
+        signals.segment_partial.connect(lambda text: print(f"... {text}"))
+        signals.segment_final.connect(print)
+        jobs.extend(
+            processor.process_stream(
+                path,
+                args.language,
+                args.task,
+                args.model,
+                source_type=args.source_type,
+                **options,
+            )
+            for path in paths
+        )
+    elif args.detect_language:
+        jobs.extend(
+            processor.detect_languages(
+                paths, args.model, windows=args.language_windows, **options
+            ).result()
+        )
+    else:
+        jobs.extend(
+            processor.process_batch(
+                paths,
+                args.language,
+                args.task,
+                args.model,
+                chunk_workers=args.chunk_workers,
+                memory_limit_mb=args.memory_limit,
+                **options,
+            ).result()
+        )
+    if not jobs:
+        processor.stop()
+        return 1
+    check_finished()
+    interrupted = False
+    try:
+        # wait() with a timeout, so Ctrl+C is handled on every platform
+        while not finished.wait(timeout=1):
+            pass
+    except KeyboardInterrupt:
+        print("Cancelling, partial transcripts are kept", file=sys.stderr)
+        interrupted = True
+        processor.cancel()
+        finished.wait()
+
+    # files the wrapper didn't accept were already reported, they count as failed
+    failed = len(paths) - len(jobs)
+    if args.detect_language:
+        status = write_languages(processor, jobs, args.output_dir, failed)
+        return EXIT_INTERRUPTED if interrupted else status
+
+    base = output_base(paths)
+    used: set[str] = set()
+    for job in jobs:
+        if job.state == JobState.FAILED:
+            failed += 1
+            print(f"Failed: {job.file_path} ({job.error})", file=sys.stderr)
+            continue
+        if not job.output_path:
+            continue
+        # the .txt is written while transcribing, so there is one even without exports
+        exports = job.exports or {"txt": job.output_path}
+        for fmt, path in exports.items():
+            destination = output_path(args.output_dir, base, job.file_path, fmt, used)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            copyfile(path, destination)
+            print(f"{job.file_path} -> {destination} ({job.state.value})")
+        if job.peak_rss_mb is not None:
+            print(f"{job.file_path}: peak memory {job.peak_rss_mb:.0f} MB")
+
+    processor.stop()
+    # an interrupted batch is not complete, even if nothing failed
+    if interrupted:
+        return EXIT_INTERRUPTED
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -4,7 +4,18 @@ from os import path
 COLOR_INFO = "#0EAD69"
 COLOR_ERROR = "#DB162F"
 COLOR_DEFAULT = "white"
+COLOR_PARTIAL = "gray"
 
 # Window
 WINDOW_TITLE = "OpenVerbum"
 WINDOW_ICON = path.join("logo", "png", "logo-black-no-text-no-bg.png")
+
+# Updates from the backend are applied to the widgets at most once per interval
+UPDATE_INTERVAL_MS = 100
+# Lines kept in the information label
+INFO_MAX_LINES = 6
+
+# Processes transcribing the chunks of long files (0 = from the cores and the free memory)
+CHUNK_WORKERS = 0
+# Transcript rows laid out per batch (the rest are laid out when needed)
+TRANSCRIPT_BATCH_SIZE = 200
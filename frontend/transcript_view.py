@@ -0,0 +1,98 @@
+# PyQt6 and related
+from PyQt6.QtWidgets import QListView
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt6.QtGui import QColor
+
+# Locals
+import frontend.config as CONFIG
+
+
+class TranscriptModel(QAbstractListModel):
+    # One row per final segment, plus the partial one (live transcription) at the end
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lines: list[str] = []
+        self.partial = ""
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return len(self.lines) + (1 if self.partial else 0)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        row = index.row()
+        is_partial = row == len(self.lines)
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.partial if is_partial else self.lines[row]
+        if role == Qt.ItemDataRole.ForegroundRole and is_partial:
+            return QColor(CONFIG.COLOR_PARTIAL)
+        return None
+
+    def append_lines(self, lines: list[str]) -> None:
+        # Added in one insert, whatever the number of lines
+        lines = [line for line in lines if line]
+        if not lines:
+            return
+
+        self.set_partial("")
+        first = len(self.lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
+    def set_partial(self, text: str) -> None:
+        row = len(self.lines)
+        if text and self.partial:
+            self.partial = text
+            self.dataChanged.emit(self.index(row), self.index(row))
+        elif text:
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.partial = text
+            self.endInsertRows()
+        elif self.partial:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.partial = ""
+            self.endRemoveRows()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self.lines = []
+        self.partial = ""
+        self.endResetModel()
+
+
+class TranscriptView(QListView):
+    """
+    Live transcript. Only the visible rows are laid out and painted (uniform item
+    sizes, batched layout), so it stays responsive with very long transcripts.
+    It follows the new lines while the user is at the bottom.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.transcript = TranscriptModel(self)
+        self.setModel(self.transcript)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(CONFIG.TRANSCRIPT_BATCH_SIZE)
+
+        self.follow = True
+        self.transcript.rowsAboutToBeInserted.connect(self._check_follow)
+        self.transcript.rowsInserted.connect(self._scroll)
+
+    def _check_follow(self, *_) -> None:
+        scroll_bar = self.verticalScrollBar()
+        self.follow = scroll_bar.value() >= scroll_bar.maximum()
+
+    def _scroll(self, *_) -> None:
+        if self.follow:
+            self.scrollToBottom()
+
+    def append_lines(self, lines: list[str]) -> None:
+        self.transcript.append_lines(lines)
+
+    def set_partial(self, text: str) -> None:
+        self.transcript.set_partial(text)
+
+    def clear(self) -> None:
+        self.transcript.clear()
+        self.follow = True
@@ -10,7 +10,7 @@ from PyQt6.QtWidgets import (
     QComboBox,
     QCheckBox,
 )
-from PyQt6.QtCore import pyqtSignal, QObject
+from PyQt6.QtCore import pyqtSignal, QObject, Qt, QTimer
 from PyQt6.QtGui import QIcon
 
 # Material UI stylesheet
@@ -18,11 +18,12 @@ from qt_material import apply_stylesheet
 
 # Locals
 import frontend.config as CONFIG
+from frontend.transcript_view import TranscriptView
 
 # Other libraries
 import os
 import sys
-from typing import Tuple
+from typing import Callable, Optional, Tuple
 import pathlib
 from shutil import copyfile
 from enum import Enum, auto
@@ -43,6 +44,7 @@ class TEXT:
     SELECT_FILE_LABEL = "Select file"
     # buttons and it's labels
     NO_FILE_SELECTED = "No file selected..."
+    FILES_SELECTED = "{count} files selected"
     OPEN_FILE_BUTTON = "Select file"
     PROCESS_FILE_BUTTON = "Process file"
 
@@ -53,6 +55,19 @@ class TEXT:
     # Downloading transcription
     DOWNLOAD_BUTTON = "Download ⬇"
 
+    # Save dialog filters, by extension
+    SAVE_FILTERS = {
+        "txt": "Text Files (*.txt)",
+        "srt": "SubRip subtitles (*.srt)",
+        "vtt": "WebVTT subtitles (*.vtt)",
+        "tsv": "Tab separated values (*.tsv)",
+        "json": "JSON with word timestamps (*.json)",
+        "ovb": "OpenVerbum binary (*.ovb)",
+    }
+
+    # Cancelling
+    CANCEL_BUTTON = "Cancel ✖"
+
     # Radio buttons
     TRANSCRIBE_RADIO = "X voice --> X text"
     TRANSLATE_RADIO = "X voice --> English text"
@@ -67,26 +82,46 @@ class TEXT:
     IS_TRANSLATE = "Translate"
     IS_TRANSCRIBE = "Transcribe"
 
+    # Model
+    MODEL_LABEL = "Model:"
+    MODEL_DEFAULT = "tiny"
+    PRECISIONS = ["fp32", "fp16", "int8"]
+
 
 class Signals(QObject):
     # progress tracking
-    process_requested = pyqtSignal(str, str, str)
+    cancel_requested = pyqtSignal()
+    # file paths, language, task and backend options (model, precision...)
+    batch_requested = pyqtSignal(list, str, str, dict)
     process_error = pyqtSignal(str)
     process_info = pyqtSignal(str)
     process_started = pyqtSignal()
     process_done = pyqtSignal(str)
     save_file = pyqtSignal(str)
 
-    # progress bar
+    # progress bar (whole batch)
     advance_bar = pyqtSignal(int)
+    # real-time factor and ETA in seconds
+    process_stats = pyqtSignal(float, float)
+
+    # per job tracking: job id and state / progress
+    job_state = pyqtSignal(int, str)
+    job_progress = pyqtSignal(int, int)
+
+    # live transcription
+    segment_partial = pyqtSignal(str)
+    segment_final = pyqtSignal(str)
 
 
-# sets the QLabel text, color and adjusts it's size
+# sets the QLabel text, color and adjusts it's size (only what changed)
 def set_text(label, text, color=CONFIG.COLOR_DEFAULT) -> QLabel:
-    label.setText(text)
-    label.setStyleSheet(f"color: {color};")
-    label.adjustSize()
-    label.setScaledContents(True)
+    if label.property("text_color") != color:
+        label.setStyleSheet(f"color: {color};")
+        label.setProperty("text_color", color)
+    if label.text() != text:
+        label.setText(text)
+        label.adjustSize()
+        label.setScaledContents(True)
     return label
 
 
@@ -113,14 +148,19 @@ def get_info_button_style(primary_color, secondary_color):
 class MainWindow(QWidget):
     def __init__(self, G_CONFIG: G_CONFIG):
         super().__init__()
-        self.setGeometry(500, 200, 540, 450)
+        self.setGeometry(500, 200, 540, 640)
         self.setWindowTitle(CONFIG.WINDOW_TITLE)
         self.setWindowIcon(QIcon(CONFIG.WINDOW_ICON))
         self.G_CONFIG = G_CONFIG
         self.signals = Signals()
 
         self.current_file = ""
+        self.current_files: list[str] = []
         self.transcription_path = ""
+        # lines of the information label, the last INFO_MAX_LINES
+        self.info_lines: list[str] = []
+        # id, state and progress of the job in the job label
+        self.shown_job: tuple = (None, "", 0)
 
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setRange(0, 100)
@@ -143,9 +183,20 @@ class MainWindow(QWidget):
         )
         self.download_button.setText(TEXT.DOWNLOAD_BUTTON)
 
+        self.cancel_button = QPushButton(self)
+        self.cancel_button.move(330, 350)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setStyleSheet(
+            get_info_button_style(CONFIG.COLOR_ERROR, os.environ["QTMATERIAL_SECONDARYLIGHTCOLOR"])
+        )
+        self.cancel_button.setText(TEXT.CANCEL_BUTTON)
+
         self.progress_label = QLabel(self)
         self.progress_label.move(320, 112)
 
+        self.stats_label = QLabel(self)
+        self.stats_label.move(200, 88)
+
         self.opened_file_label = QLabel(self)
         self.opened_file_label.move(200, 60)
         set_text(self.opened_file_label, TEXT.NO_FILE_SELECTED)
@@ -153,9 +204,13 @@ class MainWindow(QWidget):
         self.info_label = QLabel(self)
         self.info_label.move(150, 215)
 
+        self.job_label = QLabel(self)
+        self.job_label.move(200, 135)
+
         self.file_opener_button.clicked.connect(self.open_file)
         self.file_processor_button.clicked.connect(self.process_file)
         self.download_button.clicked.connect(self.save_file)
+        self.cancel_button.clicked.connect(self.cancel_process)
 
         self.transcribe_radio = QRadioButton(self)
         self.transcribe_radio.setText(TEXT.TRANSCRIBE_RADIO)
@@ -186,8 +241,38 @@ class MainWindow(QWidget):
             ]
         ]
 
+        self.model_label = QLabel(self)
+        self.model_label.move(50, 260)
+        set_text(self.model_label, TEXT.MODEL_LABEL)
+
+        self.model_combo = QComboBox(self)
+        self.model_combo.move(50, 285)
+        self.model_combo.setMinimumWidth(120)
+
+        self.precision_combo = QComboBox(self)
+        self.precision_combo.move(190, 285)
+        self.precision_combo.addItems(TEXT.PRECISIONS)
+
+        self.transcript_view = TranscriptView(self)
+        self.transcript_view.setGeometry(50, 400, 440, 220)
+
         self.reset_labels()
 
+    def set_models(self, models: list[tuple[str, str]]):
+        # (name, description) pairs, the description is shown as tooltip
+        self.model_combo.clear()
+        for index, (name, description) in enumerate(models):
+            self.model_combo.addItem(name)
+            self.model_combo.setItemData(index, description, Qt.ItemDataRole.ToolTipRole)
+        self.model_combo.setCurrentText(TEXT.MODEL_DEFAULT)
+
+    def get_backend_options(self) -> dict:
+        return {
+            "model": self.model_combo.currentText() or TEXT.MODEL_DEFAULT,
+            "precision": self.precision_combo.currentText(),
+            "chunk_workers": CONFIG.CHUNK_WORKERS,
+        }
+
     def update_task_info(self):
         current_task = self.get_current_task()
 
@@ -213,14 +298,14 @@ class MainWindow(QWidget):
         lang_is_checked = self.choose_language_checkbox.isChecked()
         self.translate_combo.setEnabled(lang_is_checked)
 
-    def fake_process(self):
-        # For debugging, so you dont have to pick a file everytime
-        self.signals.process_requested.emit("media/audio2.mp3")
-
     def reset_labels(self):
         # Resets the information labels and the progress bar
         set_text(self.progress_label, "")
+        set_text(self.job_label, "")
+        self.shown_job = (None, "", 0)
+        set_text(self.stats_label, "")
         set_text(self.info_label, "")
+        self.info_lines = []
 
         #
         self.update_task_info()
@@ -235,30 +320,40 @@ class MainWindow(QWidget):
         self.file_opener_button.setEnabled(False)
         self.file_processor_button.setEnabled(False)
         self.download_button.setEnabled(False)
+        self.model_combo.setEnabled(False)
+        self.precision_combo.setEnabled(False)
+        self.cancel_button.setEnabled(True)
 
     def unblock_buttons(self):
         # Unblocks opening and processing buttons
         self.file_opener_button.setEnabled(True)
         self.file_processor_button.setEnabled(True)
         self.download_button.setEnabled(True)
+        self.model_combo.setEnabled(True)
+        self.precision_combo.setEnabled(True)
+        self.cancel_button.setEnabled(False)
 
     def open_file(self):
         # OS file opener handler, sets filename label and saves filepath if valid
         self.file_processor_button.setEnabled(False)
         self.reset_labels()
-        file_path, _ = QFileDialog.getOpenFileName(
+        file_paths, _ = QFileDialog.getOpenFileNames(
             None,
             TEXT.SELECT_FILE_LABEL,
             "",
         )
-        if not file_path:
+        if not file_paths:
             set_text(self.opened_file_label, TEXT.NO_FILE_SELECTED)
             self.file_processor_button.setEnabled(False)
             return
 
         self.file_processor_button.setEnabled(True)
-        set_text(self.opened_file_label, self._get_file_name_and_ext(file_path))
-        self.current_file = file_path
+        if len(file_paths) == 1:
+            set_text(self.opened_file_label, self._get_file_name_and_ext(file_paths[0]))
+        else:
+            set_text(self.opened_file_label, TEXT.FILES_SELECTED.format(count=len(file_paths)))
+        self.current_file = file_paths[0]
+        self.current_files = file_paths
 
     def _get_file_name_and_ext(self, file_path: str) -> str:
         # returns the filename with extension from the filepath
@@ -269,19 +364,29 @@ class MainWindow(QWidget):
         return pathlib.Path(file_path).stem
 
     def save_file(self):
-        save_file_path, _ = QFileDialog.getSaveFileName(
+        # The backend exports every format next to the .txt transcription
+        save_file_path, selected_filter = QFileDialog.getSaveFileName(
             self,
             "Save File",
             self._get_file_name_alone(self.current_file) + ".txt",
-            "Text Files (*.txt)",
+            ";;".join(TEXT.SAVE_FILTERS.values()),
         )
         if not save_file_path:
             return
 
-        if "." not in save_file_path and not save_file_path.endswith(".txt"):
-            save_file_path += ".txt"
+        # a typed extension wins over the selected filter
+        extension = pathlib.Path(save_file_path).suffix.lstrip(".")
+        if extension not in TEXT.SAVE_FILTERS:
+            extension = "txt"
+            for ext, file_filter in TEXT.SAVE_FILTERS.items():
+                if file_filter == selected_filter:
+                    extension = ext
+            save_file_path += f".{extension}"
 
-        copyfile(self.transcription_path, save_file_path)
+        source_path = os.path.splitext(self.transcription_path)[0] + f".{extension}"
+        if not os.path.exists(source_path):
+            source_path = self.transcription_path
+        copyfile(source_path, save_file_path)
 
     def get_current_task(self) -> Task:
         is_transcribe = self.transcribe_radio.isChecked()
@@ -301,16 +406,26 @@ class MainWindow(QWidget):
 
     def process_file(self):
         # Handles the click of "process" button
-        self.signals.process_requested.emit(
-            self.current_file,
+        self.signals.batch_requested.emit(
+            self.current_files,
             self.get_current_language(),
             self.get_current_task().name.lower(),
+            self.get_backend_options(),
         )
         self.reset_labels()
 
+    def cancel_process(self):
+        # Handles the click of "cancel" button, the backend answers with process_done
+        self.cancel_button.setEnabled(False)
+        self.signals.cancel_requested.emit()
+
     def handle_error(self, message: str):
-        # Handles an error recieved from backend. Resets labels and sets the error message
+        # Handles an error recieved from backend. Resets labels and sets the error message.
+        # The buttons are unblocked as when a process finishes, but the files are not
+        # processed again, and only a transcript of an earlier process can be downloaded
+        self.unblock_buttons()
         self.file_processor_button.setEnabled(False)
+        self.download_button.setEnabled(bool(self.transcription_path))
         self.reset_labels()
         set_text(self.info_label, f"❎ {message}", CONFIG.COLOR_ERROR)
 
@@ -321,27 +436,55 @@ class MainWindow(QWidget):
         if not message:
             return
 
-        old_message = self.info_label.text()
+        old_lines = self.info_lines
         if reset_other_labels:
             self.reset_labels()
 
-        if append_new_line:
-            msg = f"{old_message}\n☑ {message}"
-        else:
-            msg = f"\n☑ {message}"
+        self.info_lines = old_lines if append_new_line else []
+        self.show_info([message])
 
-        set_text(self.info_label, msg, CONFIG.COLOR_INFO)
+    def show_info(self, messages: list[str]):
+        # Info lines of the backend, batched (see main.py): one label update per batch,
+        # and only the last lines are kept so long batches don't grow the label
+        self.info_lines.extend(f"☑ {message}" for message in messages if message)
+        del self.info_lines[: -CONFIG.INFO_MAX_LINES]
+        set_text(self.info_label, "\n" + "\n".join(self.info_lines), CONFIG.COLOR_INFO)
 
     def advance_bar(self, value: int):
         # When called from backend, it updates the progress bar
-        self.progress_bar.setValue(value)
+        if self.progress_bar.value() != value:
+            self.progress_bar.setValue(value)
         set_text(self.progress_label, f"{value}%")
 
+    def handle_job_state(self, job_id: int, state: str):
+        # Shows the state of the last job that changed
+        shown_id, _, percent = self.shown_job
+        self.shown_job = (job_id, state, percent if job_id == shown_id else 0)
+        self.show_job()
+
+    def show_job_progress(self, job_id: int, percent: int):
+        # Progress of the job in the job label (the bar is the one of the whole batch)
+        shown_id, state, _ = self.shown_job
+        if job_id == shown_id:
+            self.shown_job = (job_id, state, percent)
+            self.show_job()
+
+    def show_job(self):
+        job_id, state, percent = self.shown_job
+        progress = f" {percent}%" if 0 < percent < 100 else ""
+        set_text(self.job_label, f"Job {job_id}: {state}{progress}")
+
+    def show_stats(self, rtf: float, eta: float):
+        # Real-time factor (processing time / audio time) and time left
+        minutes, seconds = divmod(int(eta), 60)
+        set_text(self.stats_label, f"RTF {rtf:.2f} · ETA {minutes}:{seconds:02d}")
+
     def start_process(self):
         # What happens when the backend starts a processing task
         self.handle_info(TEXT.INFO_PROCESSING)
         self.block_buttons()
         self.progress_bar.setValue(0)
+        self.transcript_view.clear()
 
     def finish_process(self, transcription_path: str):
         # What happens when the backend finishes a processing task
@@ -361,6 +504,9 @@ def create_ui(G_CONFIG) -> Tuple[QApplication, MainWindow]:
     return app, window
 
 
-def launch_ui(app, window) -> None:
+def launch_ui(app, window, on_shown: Optional[Callable] = None) -> None:
+    # on_shown() runs as soon as the event loop starts, with the window already on screen
     window.show()
+    if on_shown is not None:
+        QTimer.singleShot(0, on_shown)
     sys.exit(app.exec())
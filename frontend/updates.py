@@ -0,0 +1,72 @@
+# PyQt6 and related
+from PyQt6.QtCore import QObject, QTimer
+
+# Locals
+import frontend.config as CONFIG
+
+# Other libraries
+from threading import Lock
+from typing import Callable
+
+
+class UpdateCoalescer(QObject):
+    """
+    Backend signals can arrive hundreds of times per second on long transcripts.
+    The slots made here only store what arrived (they are cheap and thread safe), and
+    a timer applies it to the widgets at a fixed rate, in the GUI thread:
+    - latest_only: only the last value is applied, and only if it changed
+    - batched: every value is kept and applied in one call per tick
+    """
+
+    def __init__(self, parent=None, interval_ms: int = CONFIG.UPDATE_INTERVAL_MS):
+        super().__init__(parent)
+        self.lock = Lock()
+        self.appliers: dict[str, Callable] = {}
+        self.latest: dict[str, tuple] = {}
+        self.applied: dict[str, tuple] = {}
+        self.batches: dict[str, list] = {}
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(interval_ms)
+
+    def latest_only(self, key: str, apply: Callable) -> Callable:
+        self.appliers[key] = apply
+
+        def slot(*args):
+            with self.lock:
+                self.latest[key] = args
+
+        return slot
+
+    def batched(self, key: str, apply: Callable) -> Callable:
+        # apply receives the list of the values (first argument of every emit)
+        self.appliers[key] = apply
+        self.batches[key] = []
+
+        def slot(value):
+            with self.lock:
+                self.batches[key].append(value)
+
+        return slot
+
+    def reset(self) -> None:
+        # Forgets what was applied, so the next values are applied even if equal
+        with self.lock:
+            self.applied.clear()
+
+    def flush(self) -> None:
+        with self.lock:
+            latest, self.latest = self.latest, {}
+            batches = {key: values for key, values in self.batches.items() if values}
+            for key in batches:
+                self.batches[key] = []
+
+        for key, values in batches.items():
+            self.appliers[key](values)
+
+        for key, args in latest.items():
+            if self.applied.get(key) == args:
+                continue
+            self.applied[key] = args
+            self.appliers[key](*args)
@@ -1,23 +1,58 @@
-from backend.voice_wrapper import VoiceProcessor
+import time
 
-from frontend.ui import create_ui, launch_ui
+# startup time is measured from here (see on_shown)
+STARTED_AT = time.perf_counter()
+
+from backend.logs import log_metrics  # noqa: E402
+from backend.utils import describe_models  # noqa: E402
+from backend.voice_wrapper import VoiceProcessor  # noqa: E402
+
+from frontend.ui import create_ui, launch_ui  # noqa: E402
+from frontend.updates import UpdateCoalescer  # noqa: E402
+
+import global_config as G_CONFIG  # noqa: E402
+
+
+def on_shown(window, backend) -> None:
+    # The backend (whisper, torch and the model) is loaded after the window is on screen,
+    # in the background. Both times go to the metrics log ("startup" and "warmup")
+    log_metrics("startup", window_seconds=round(time.perf_counter() - STARTED_AT, 3))
+    backend.warm_up(**window.get_backend_options())
 
-import global_config as G_CONFIG
 
 if __name__ == "__main__":
     app, window = create_ui(G_CONFIG)
     SIGNALS = window.signals
     backend = VoiceProcessor(SIGNALS)
+    window.set_models(describe_models())
+    app.aboutToQuit.connect(backend.stop)
 
     # front calling back
-    SIGNALS.process_requested.connect(backend.process_file)
+    SIGNALS.cancel_requested.connect(backend.cancel)
+    SIGNALS.batch_requested.connect(
+        lambda paths, language, task, options: backend.process_batch(
+            paths, language, task, **options
+        )
+    )
 
     # back calling front
     SIGNALS.process_error.connect(window.handle_error)
-    SIGNALS.process_info.connect(window.handle_info)
     SIGNALS.process_started.connect(window.start_process)
     SIGNALS.process_done.connect(window.finish_process)
 
-    SIGNALS.advance_bar.connect(window.advance_bar)
+    # frequent updates are coalesced, see frontend/updates.py
+    updates = UpdateCoalescer(window)
+    SIGNALS.process_started.connect(updates.reset)
+    SIGNALS.advance_bar.connect(updates.latest_only("bar", window.advance_bar))
+    SIGNALS.job_state.connect(updates.latest_only("job_state", window.handle_job_state))
+    SIGNALS.job_progress.connect(updates.latest_only("job_progress", window.show_job_progress))
+    SIGNALS.process_stats.connect(updates.latest_only("stats", window.show_stats))
+    SIGNALS.process_info.connect(updates.batched("info", window.show_info))
+    SIGNALS.segment_final.connect(
+        updates.batched("segments", window.transcript_view.append_lines)
+    )
+    SIGNALS.segment_partial.connect(
+        updates.latest_only("partial", window.transcript_view.set_partial)
+    )
 
-    launch_ui(app, window)
+    launch_ui(app, window, on_shown=lambda: on_shown(window, backend))